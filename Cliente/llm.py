@@ -0,0 +1,170 @@
+# llm.py
+# Cliente LLM asíncrono: un solo httpx.AsyncClient con keep-alive compartido
+# por todos los usuarios, límite de concurrencia y reintentos con jitter.
+# El backend es intercambiable (LLM_BACKEND) para poder apuntar a un servidor
+# local de pruebas (bench/fake_llm.py) o no usar red en absoluto ("echo").
+import asyncio
+import json
+import os
+import random
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+class LLMBackend:
+    """Interfaz: chat(messages, ...) -> texto; stream(...) -> trozos de texto."""
+
+    async def chat(self, messages: List[Dict[str, str]], temperature: float = 0.3,
+                   max_tokens: int = 400) -> str:
+        raise NotImplementedError
+
+    async def stream(self, messages: List[Dict[str, str]], temperature: float = 0.3,
+                     max_tokens: int = 400) -> AsyncIterator[str]:
+        # backends sin streaming: un único trozo con la respuesta completa
+        yield await self.chat(messages, temperature, max_tokens)
+
+    async def close(self):
+        pass
+
+class OpenAICompatBackend(LLMBackend):
+    """
+    Cualquier API tipo OpenAI /chat/completions (Groq, vLLM, el servidor
+    falso de bench/). Reintenta 429/5xx y errores de red con backoff
+    exponencial y jitter completo, respetando Retry-After si viene.
+    """
+    RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(self, base_url: str, api_key: str, model: str, timeout: float = 30.0,
+                 max_concurrency: int = 16, retries: int = 2, backoff: float = 0.5,
+                 max_connections: int = 32):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # se crea dentro del event loop en el primer uso
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def _espera(self, intento: int, resp: Optional[httpx.Response]) -> float:
+        if resp is not None:
+            ra = resp.headers.get("retry-after")
+            if ra and ra.replace(".", "", 1).isdigit():
+                return float(ra)
+        return random.uniform(0, self.backoff * 2 ** intento)
+
+    async def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        http = self._http()
+        async with self._sem:
+            for intento in range(self.retries + 1):
+                resp = None
+                try:
+                    resp = await http.post("/chat/completions", json=payload)
+                    if resp.status_code not in self.RETRY_STATUS or intento == self.retries:
+                        return resp.json()
+                except httpx.TransportError:
+                    if intento == self.retries:
+                        raise
+                await asyncio.sleep(self._espera(intento, resp))
+        raise RuntimeError("unreachable")
+
+    async def chat(self, messages, temperature=0.3, max_tokens=400) -> str:
+        payload = {"model": self.model, "messages": messages,
+                   "temperature": temperature, "max_tokens": max_tokens}
+        try:
+            data = await self._post(payload)
+        except (httpx.HTTPError, json.JSONDecodeError) as e:
+            return f"[LLM error] {type(e).__name__}: {e}"
+        try:
+            return data["choices"][0]["message"]["content"].strip()
+        except Exception:
+            return f"[LLM error] {data}"
+
+    async def stream(self, messages, temperature=0.3, max_tokens=400) -> AsyncIterator[str]:
+        """
+        Tokens a medida que llegan (SSE de la API). Los reintentos solo se
+        hacen antes del primer trozo; un error después corta el stream con
+        un aviso "[LLM error]".
+        """
+        payload = {"model": self.model, "messages": messages, "temperature": temperature,
+                   "max_tokens": max_tokens, "stream": True}
+        http = self._http()
+        emitido = False
+        async with self._sem:
+            for intento in range(self.retries + 1):
+                try:
+                    async with http.stream("POST", "/chat/completions", json=payload) as resp:
+                        if resp.status_code in self.RETRY_STATUS and intento < self.retries:
+                            await asyncio.sleep(self._espera(intento, resp))
+                            continue
+                        if resp.status_code != 200:
+                            body = (await resp.aread()).decode("utf-8", "replace")
+                            yield f"[LLM error] {resp.status_code} {body[:300]}"
+                            return
+                        async for line in resp.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                return
+                            try:
+                                delta = json.loads(data)["choices"][0]["delta"].get("content")
+                            except (ValueError, KeyError, IndexError):
+                                continue
+                            if delta:
+                                emitido = True
+                                yield delta
+                        return
+                except httpx.TransportError as e:
+                    # reintentar tras haber emitido repetiría la respuesta desde el principio
+                    if emitido or intento == self.retries:
+                        yield f"{' ' if emitido else ''}[LLM error] {type(e).__name__}: {e}"
+                        return
+                    await asyncio.sleep(self._espera(intento, None))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class EchoBackend(LLMBackend):
+    """Sin red: devuelve el último mensaje del usuario. Para pruebas locales."""
+
+    async def chat(self, messages, temperature=0.3, max_tokens=400) -> str:
+        user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        return user[: max_tokens * 4]
+
+    async def stream(self, messages, temperature=0.3, max_tokens=400) -> AsyncIterator[str]:
+        texto = await self.chat(messages, temperature, max_tokens)
+        for palabra in texto.split(" "):
+            yield palabra + " "
+
+def backend_from_env() -> LLMBackend:
+    kind = os.getenv("LLM_BACKEND", "groq")
+    if kind == "echo":
+        return EchoBackend()
+    return OpenAICompatBackend(
+        base_url=os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1"),
+        api_key=os.getenv("GROQ_API_KEY", "API KEY"),
+        model=os.getenv("GROQ_MODEL", "llama-3.1-8b-instant"),
+        timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+        retries=int(os.getenv("LLM_RETRIES", "2")),
+    )
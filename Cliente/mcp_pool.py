@@ -0,0 +1,226 @@
+# mcp_pool.py
+# Pool de conexiones WebSocket persistentes al servidor MCP.
+# Cada conexión hace el handshake (initialize) una sola vez y luego multiplexa
+# requests por "id", así que una llamada a herramienta es un solo round trip.
+import asyncio
+import itertools
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import websockets
+
+class MCPError(RuntimeError):
+    """Error JSON-RPC devuelto por el servidor MCP."""
+
+class MCPConnection:
+    def __init__(self, url: str):
+        self.url = url
+        self.ws = None
+        self.server_info: Dict[str, Any] = {}
+        self._ids = itertools.count(1)
+        self._pending: Dict[Any, asyncio.Future] = {}
+        self._reader: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.ws is not None and self._reader is not None and not self._reader.done()
+
+    @property
+    def inflight(self) -> int:
+        return len(self._pending)
+
+    async def connect(self, timeout: float) -> float:
+        """Abre el socket y hace initialize; devuelve lo que tardó el handshake."""
+        t0 = time.perf_counter()
+        self.ws = await asyncio.wait_for(
+            websockets.connect(self.url, subprotocols=["jsonrpc"], max_size=None),
+            timeout,
+        )
+        self._reader = asyncio.create_task(self._leer())
+        self.server_info = await self.request("initialize", {}, timeout)
+        return time.perf_counter() - t0
+
+    async def _leer(self):
+        try:
+            async for raw in self.ws:
+                data = json.loads(raw)
+                for msg in data if isinstance(data, list) else [data]:
+                    fut = self._pending.pop(msg.get("id"), None)
+                    if fut is not None and not fut.done():
+                        fut.set_result(msg)
+        except Exception:
+            pass
+        finally:
+            err = ConnectionError("MCP connection closed")
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(err)
+            self._pending.clear()
+
+    async def request(self, method: str, params: dict, timeout: float) -> Any:
+        if self.ws is None or (self._reader is not None and self._reader.done()):
+            raise ConnectionError("MCP connection closed")
+        rid = next(self._ids)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[rid] = fut
+        try:
+            await self.ws.send(json.dumps({"jsonrpc": "2.0", "id": rid, "method": method, "params": params}))
+            data = await asyncio.wait_for(fut, timeout)
+        finally:
+            self._pending.pop(rid, None)
+        if "error" in data:
+            raise MCPError(data["error"])
+        return data["result"]
+
+    async def ping(self, timeout: float):
+        pong = await self.ws.ping()
+        await asyncio.wait_for(pong, timeout)
+
+    async def refrescar(self, timeout: float):
+        """tools/list: comprueba que el servidor responde y trae su dataVersion."""
+        res = await self.request("tools/list", {}, timeout)
+        if isinstance(res, dict) and "dataVersion" in res:
+            self.server_info["dataVersion"] = res["dataVersion"]
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+class MCPPool:
+    """
+    `size` conexiones persistentes. Cada llamada va a la conexión viva con
+    menos requests en vuelo; las caídas se reconectan con backoff exponencial
+    (con jitter) y un chequeo periódico con ping detecta sockets muertos
+    antes de que los use una llamada.
+    """
+
+    def __init__(self, url: str, size: int = 2, timeout: float = 15.0,
+                 retries: int = 3, backoff: float = 0.2, backoff_max: float = 5.0,
+                 health_interval: float = 20.0):
+        self.url = url
+        self.size = size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.health_interval = health_interval
+        self._conns: List[MCPConnection] = [MCPConnection(url) for _ in range(size)]
+        self._locks = [asyncio.Lock() for _ in range(size)]
+        self._health: Optional[asyncio.Task] = None
+        self._stats = {
+            "calls": 0,
+            "reused_calls": 0,
+            "handshakes": 0,
+            "handshake_seconds": 0.0,
+            "reconnect_failures": 0,
+            "retried_calls": 0,
+        }
+
+    async def _abrir(self, i: int) -> tuple:
+        """
+        Devuelve (conexión i viva, True si hubo que hacer el handshake ahora),
+        reconectándola si hace falta.
+        """
+        async with self._locks[i]:
+            conn = self._conns[i]
+            if conn.alive:
+                return conn, False
+            await conn.close()
+            for intento in range(self.retries):
+                conn = MCPConnection(self.url)
+                try:
+                    dt = await conn.connect(self.timeout)
+                except Exception:
+                    self._stats["reconnect_failures"] += 1
+                    await conn.close()
+                    if intento == self.retries - 1:
+                        raise
+                    espera = min(self.backoff_max, self.backoff * 2 ** intento)
+                    await asyncio.sleep(espera * random.uniform(0.5, 1.5))
+                    continue
+                self._conns[i] = conn
+                self._stats["handshakes"] += 1
+                self._stats["handshake_seconds"] += dt
+                return conn, True
+        raise ConnectionError("MCP unreachable")
+
+    def _elegir(self) -> int:
+        vivas = [i for i, c in enumerate(self._conns) if c.alive]
+        if not vivas:
+            return random.randrange(self.size)
+        mejor = min(vivas, key=lambda i: self._conns[i].inflight)
+        cerradas = [i for i, c in enumerate(self._conns) if not c.alive]
+        if self._conns[mejor].inflight and cerradas:
+            # una ranura sin abrir cuenta como carga 0: si no, el pool se
+            # queda en una sola conexión (y con gunicorn, en un solo worker)
+            return random.choice(cerradas)
+        return mejor
+
+    async def request(self, method: str, params: dict) -> Any:
+        self._ensure_health()
+        self._stats["calls"] += 1
+        for intento in range(2):
+            conn, nueva = await self._abrir(self._elegir())
+            try:
+                result = await conn.request(method, params, self.timeout)
+            except ConnectionError:
+                # el socket se cayó a mitad de la llamada: las herramientas son
+                # de solo lectura, se reintenta una vez en una conexión nueva
+                if intento == 0:
+                    self._stats["retried_calls"] += 1
+                    continue
+                raise
+            if not nueva:
+                self._stats["reused_calls"] += 1
+            return result
+
+    async def call_tool(self, name: str, arguments: dict) -> Any:
+        return await self.request("tools/call", {"name": name, "arguments": arguments})
+
+    def _ensure_health(self):
+        if self.health_interval > 0 and (self._health is None or self._health.done()):
+            self._health = asyncio.create_task(self._bucle_health())
+
+    async def _bucle_health(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for i, conn in enumerate(self._conns):
+                if not conn.alive:
+                    continue
+                try:
+                    await conn.ping(self.timeout)
+                    await conn.refrescar(self.timeout)
+                except Exception:
+                    await conn.close()
+                    try:
+                        await self._abrir(i)
+                    except Exception:
+                        pass
+
+    @property
+    def data_version(self) -> Any:
+        """Versión de datos más reciente que anunció el servidor (o None)."""
+        vs = [c.server_info.get("dataVersion") for c in self._conns if c.alive]
+        vs = [v for v in vs if v is not None]
+        return max(vs) if vs else None
+
+    async def close(self):
+        if self._health is not None:
+            self._health.cancel()
+        await asyncio.gather(*(c.close() for c in self._conns), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        s = dict(self._stats)
+        hs = s["handshakes"]
+        avg = s["handshake_seconds"] / hs if hs else 0.0
+        s["size"] = self.size
+        s["alive"] = sum(c.alive for c in self._conns)
+        s["reuse_rate"] = round(s["reused_calls"] / s["calls"], 4) if s["calls"] else 0.0
+        s["avg_handshake_ms"] = round(avg * 1000, 2)
+        # sin pool cada llamada pagaba conexión + initialize + tools/list
+        s["handshake_ms_saved"] = round(s["reused_calls"] * avg * 1000, 1)
+        return s
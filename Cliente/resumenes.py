@@ -0,0 +1,146 @@
+# resumenes.py
+# Respuestas "ancladas" a datos de herramientas MCP sin pasar siempre por el LLM:
+#  - una plantilla determinista para resultados pequeños (o vacíos), y
+#  - una caché LRU/TTL de resúmenes ya generados, con clave hash(herramienta,
+#    intención normalizada, JSON de la herramienta).
+# Si los datos del servidor cambian, cambia el JSON y con él la clave; además
+# la caché se vacía cuando el servidor MCP anuncia otro dataVersion.
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+def _norm(v: Any) -> Any:
+    if isinstance(v, str):
+        return re.sub(r"\s+", " ", v.strip().lower())
+    if isinstance(v, dict):
+        return {k: _norm(x) for k, x in v.items()}
+    return v
+
+def clave_resumen(tool_name: str, args: Dict[str, Any], tool_json: Any) -> str:
+    """La intención es la de los argumentos de la herramienta, no el texto literal."""
+    intencion = {k: _norm(v) for k, v in sorted(args.items())}
+    raw = json.dumps([tool_name, intencion, tool_json], ensure_ascii=False,
+                     sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _tienda(r: Dict[str, Any]) -> str:
+    linea = f"- {r.get('Nombre', '-')}: {r.get('Calle', '-')}, {r.get('Ciudad', '-')}"
+    if r.get("Zona") not in (None, ""):
+        linea += f" (zona {r['Zona']})"
+    if r.get("Producto"):
+        linea += f" — {r['Producto']}"
+        if r.get("Stock") not in (None, ""):
+            linea += f", stock {r['Stock']}"
+    return linea
+
+def plantilla(tool_name: str, tool_json: Any, zona: Optional[str], max_items: int) -> Optional[str]:
+    """
+    Texto determinista para resultados de hasta `max_items` elementos;
+    None si el resultado es grande (o de forma desconocida) y conviene el LLM.
+    """
+    if max_items <= 0:
+        return None
+    donde = f" en la zona {zona}" if zona else ""
+
+    if tool_name == "find_stores_by_zone" and isinstance(tool_json, dict) and "items" in tool_json:
+        # página {items, nextCursor, total}: solo se resuelve si vino completa
+        if tool_json.get("total", 0) > len(tool_json["items"]):
+            return None
+        tool_json = tool_json["items"]
+
+    if tool_name == "find_stores_by_zone" and isinstance(tool_json, list):
+        if not tool_json:
+            return (f"No encontré tiendas{donde}. "
+                    "¿Puedes indicarme otra zona o un punto de referencia?")
+        if len(tool_json) > max_items:
+            return None
+        return f"Tiendas{donde}:\n" + "\n".join(_tienda(r) for r in tool_json)
+
+    if tool_name == "recommend_complements" and isinstance(tool_json, dict):
+        disp = tool_json.get("disponibilidad") or []
+        sug = tool_json.get("sugeridos") or []
+        if len(disp) > max_items or len(sug) > max_items:
+            return None
+        partes = []
+        coincidencia = tool_json.get("coincidencia")
+        if coincidencia:
+            partes.append(f"Entendí que buscas «{coincidencia.get('nombre')}».")
+        if disp:
+            partes.append(f"Disponibilidad{donde}:\n" + "\n".join(_tienda(r) for r in disp))
+        else:
+            partes.append(f"No encontré disponibilidad{donde}.")
+        if sug:
+            lineas = []
+            for s in sug:
+                linea = f"- {s.get('complemento_nombre', '-')}"
+                if s.get("complemento_codigo"):
+                    linea += f" ({s['complemento_codigo']})"
+                if s.get("razon"):
+                    linea += f": {s['razon']}"
+                lineas.append(linea)
+            partes.append("Complementos sugeridos:\n" + "\n".join(lineas))
+        else:
+            partes.append("No tengo complementos sugeridos para ese producto; "
+                          "¿puedes darme otra referencia?")
+        return "\n\n".join(partes)
+
+    return None
+
+class ResumenCache:
+    """LRU con TTL de resúmenes del LLM. Solo se usa desde el event loop."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version: Any = None
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "templated": 0, "invalidations": 0}
+
+    def sincronizar(self, version: Any):
+        """Vacía la caché si el servidor MCP publicó otra versión de los datos."""
+        if version is not None and version != self.version:
+            if self.version is not None:
+                self._data.clear()
+                self._stats["invalidations"] += 1
+            self.version = version
+
+    def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None or item[1] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self._stats["misses"] += 1
+            return None
+        self._data.move_to_end(key)
+        self._stats["hits"] += 1
+        return item[0]
+
+    def put(self, key: str, texto: str):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (texto, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def contar_plantilla(self):
+        self._stats["templated"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        s = dict(self._stats)
+        s["size"] = len(self._data)
+        s["maxsize"] = self.maxsize
+        total = s["hits"] + s["misses"]
+        s["hit_ratio"] = round(s["hits"] / total, 4) if total else 0.0
+        s["data_version"] = self.version
+        return s
+
+def cache_from_env() -> ResumenCache:
+    return ResumenCache(
+        maxsize=int(os.getenv("SUMMARY_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("SUMMARY_CACHE_TTL", "600")),
+    )
@@ -0,0 +1,187 @@
+# sesiones.py
+# Historial de conversación por sesión, con límite de sesiones (LRU), TTL por
+# inactividad y un presupuesto de tokens por historial: los turnos viejos se
+# pliegan en un resumen corto para que el prompt no crezca sin fin.
+# Backend en memoria (un proceso) o SQLite (varios workers compartiendo sesiones).
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+SYSTEM_PROMPT = (
+    "Eres un asistente para una distribuidora de arena para gato en Guatemala. "
+    "Cuando NO se te proporciona DATA de herramientas, responde brevemente "
+    "pidiendo zona o referencia. No inventes datos concretos. "
+    "Cuando se te proporcione DATA, se usará otro prompt para anclarte."
+)
+RESUMEN_PREFIJO = "Resumen de la conversación anterior: "
+RESUMEN_MAX_CHARS = 600
+
+def historial_nuevo() -> List[Dict[str, str]]:
+    return [{"role": "system", "content": SYSTEM_PROMPT}]
+
+def estimar_tokens(msg: Dict[str, str]) -> int:
+    # ~4 caracteres por token más el overhead del rol; basta para presupuestar
+    return len(msg.get("content", "")) // 4 + 4
+
+def recortar_historial(historial: List[Dict[str, str]], max_tokens: int) -> List[Dict[str, str]]:
+    """
+    Deja el historial dentro de `max_tokens`: conserva el prompt de sistema y
+    los turnos más recientes; los que sobran se pliegan (solo lo que dijo el
+    usuario, truncado) en un mensaje de resumen que reemplaza al anterior.
+    """
+    if sum(estimar_tokens(m) for m in historial) <= max_tokens:
+        return historial
+
+    cabeza = [m for m in historial[:1] if m["role"] == "system"]
+    resto = historial[len(cabeza):]
+    resumen_prev = ""
+    if resto and resto[0]["role"] == "system" and resto[0]["content"].startswith(RESUMEN_PREFIJO):
+        resumen_prev = resto[0]["content"][len(RESUMEN_PREFIJO):]
+        resto = resto[1:]
+
+    presupuesto = max_tokens - sum(estimar_tokens(m) for m in cabeza) - (RESUMEN_MAX_CHARS // 4 + 4)
+    recientes: List[Dict[str, str]] = []
+    usados = 0
+    for m in reversed(resto):
+        t = estimar_tokens(m)
+        if recientes and usados + t > presupuesto:
+            break
+        recientes.append(m)
+        usados += t
+    recientes.reverse()
+    viejos = resto[: len(resto) - len(recientes)]
+
+    puntos = [m["content"][:120] for m in viejos if m["role"] == "user"]
+    resumen = "; ".join(p for p in [resumen_prev] + puntos if p)
+    if len(resumen) > RESUMEN_MAX_CHARS:
+        resumen = "…" + resumen[-(RESUMEN_MAX_CHARS - 1):]
+
+    out = list(cabeza)
+    if resumen:
+        out.append({"role": "system", "content": RESUMEN_PREFIJO + resumen})
+    return out + recientes
+
+class MemorySessionStore:
+    """LRU en memoria con tope de sesiones y TTL por inactividad."""
+
+    def __init__(self, max_sessions: int = 10_000, ttl: float = 86_400, max_tokens: int = 1_500):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _purgar(self):
+        # cargar y guardar renuevan la marca y mueven la sesión al final, así
+        # que el orden LRU es el de las marcas: basta mirar desde el principio
+        limite = time.monotonic() - self.ttl
+        while self._data:
+            sid, (_, visto) = next(iter(self._data.items()))
+            if visto >= limite:
+                break
+            del self._data[sid]
+            self.expirations += 1
+        while len(self._data) > self.max_sessions:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def cargar(self, session_id: str) -> List[Dict[str, str]]:
+        self._purgar()
+        item = self._data.get(session_id)
+        if item is None:
+            return historial_nuevo()
+        ahora = time.monotonic()
+        if item[1] < ahora - self.ttl:
+            del self._data[session_id]
+            self.expirations += 1
+            return historial_nuevo()
+        self._data[session_id] = (item[0], ahora)
+        self._data.move_to_end(session_id)
+        return list(item[0])
+
+    async def guardar(self, session_id: str, historial: List[Dict[str, str]]):
+        self._data[session_id] = (recortar_historial(historial, self.max_tokens), time.monotonic())
+        self._data.move_to_end(session_id)
+        self._purgar()
+
+    def stats(self) -> Dict[str, int]:
+        return {"sessions": len(self._data), "max_sessions": self.max_sessions,
+                "evictions": self.evictions, "expirations": self.expirations}
+
+class SQLiteSessionStore:
+    """
+    Sesiones en un archivo SQLite (modo WAL), compartido por varios procesos
+    worker. Las consultas corren en un hilo aparte para no bloquear el loop.
+    """
+
+    def __init__(self, path: str, max_sessions: int = 100_000, ttl: float = 86_400,
+                 max_tokens: int = 1_500, purge_every: int = 100):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self.purge_every = purge_every
+        self._escrituras = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sesiones ("
+            " id TEXT PRIMARY KEY, historial TEXT NOT NULL, actualizado REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sesiones_actualizado ON sesiones(actualizado)")
+
+    def _cargar(self, session_id: str) -> List[Dict[str, str]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT historial FROM sesiones WHERE id = ? AND actualizado >= ?",
+                (session_id, time.time() - self.ttl),
+            ).fetchone()
+        return json.loads(row[0]) if row else historial_nuevo()
+
+    def _guardar(self, session_id: str, historial: List[Dict[str, str]]):
+        data = json.dumps(recortar_historial(historial, self.max_tokens), ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sesiones (id, historial, actualizado) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET historial = excluded.historial, actualizado = excluded.actualizado",
+                (session_id, data, time.time()),
+            )
+            self._escrituras += 1
+            if self._escrituras % self.purge_every == 0:
+                self._purgar()
+
+    def _purgar(self):
+        self._db.execute("DELETE FROM sesiones WHERE actualizado < ?", (time.time() - self.ttl,))
+        self._db.execute(
+            "DELETE FROM sesiones WHERE id IN ("
+            " SELECT id FROM sesiones ORDER BY actualizado DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+
+    async def cargar(self, session_id: str) -> List[Dict[str, str]]:
+        return await asyncio.to_thread(self._cargar, session_id)
+
+    async def guardar(self, session_id: str, historial: List[Dict[str, str]]):
+        await asyncio.to_thread(self._guardar, session_id, historial)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            n = self._db.execute("SELECT COUNT(*) FROM sesiones").fetchone()[0]
+        return {"sessions": n, "max_sessions": self.max_sessions}
+
+def store_from_env():
+    kw = {
+        "ttl": float(os.getenv("SESSION_TTL", "86400")),
+        "max_tokens": int(os.getenv("HISTORY_MAX_TOKENS", "1500")),
+    }
+    if os.getenv("SESSION_BACKEND", "memory") == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB", "sessions.sqlite3"),
+                                  max_sessions=int(os.getenv("SESSION_MAX", "100000")), **kw)
+    return MemorySessionStore(max_sessions=int(os.getenv("SESSION_MAX", "10000")), **kw)
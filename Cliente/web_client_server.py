@@ -1,32 +1,40 @@
-import os, sys, re, json, asyncio, uuid
-from typing import Dict, Any
-import requests
-import websockets
+import os, sys, re, json, asyncio, time, uuid
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from pathlib import Path
+
+# metricas.py es el mismo módulo del servidor MCP (raíz del repo)
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import metricas  # noqa: E402
+from llm import backend_from_env
+from mcp_pool import MCPPool
+from resumenes import cache_from_env, clave_resumen, plantilla
+from sesiones import recortar_historial, store_from_env
 
 # ========= CONFIG =========
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "API KEY")
-MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
 MCP_URL = os.getenv("MCP_URL", "ws://3.140.209.59:8000/mcp") 
 # MCP_URL = os.getenv("MCP_URL", "ws://127.0.0.1:8000/mcp") 
 
+# ========= Métricas (GET /metrics) =========
+# Por etapa, para saber si una respuesta lenta es MCP, sesiones o el LLM
+CHAT_SECONDS = metricas.histograma("chat_request_seconds", "Duracion total de cada turno de chat.", ["endpoint"])
+STAGE_SECONDS = metricas.histograma("chat_stage_seconds", "Duracion de cada etapa del turno.", ["stage"])
+MCP_CALL_SECONDS = metricas.histograma("mcp_client_call_seconds", "Llamadas a herramientas MCP desde el cliente.", ["tool"])
+MCP_CALL_ERRORS = metricas.contador("mcp_client_call_errors_total", "Llamadas MCP fallidas.", ["tool"])
+CHAT_INFLIGHT = metricas.medidor("chat_requests_inflight", "Turnos de chat en curso.")
+
 # ========= LLM (Groq) =========
-def chat_groq(messages, temperature=0.3, max_tokens=400, timeout=30):
-    resp = requests.post(
-        "https://api.groq.com/openai/v1/chat/completions",
-        headers={"Authorization": f"Bearer {GROQ_API_KEY}", "Content-Type": "application/json"},
-        json={"model": MODEL, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
-        timeout=timeout,
-    )
-    data = resp.json()
-    try:
-        return data["choices"][0]["message"]["content"].strip()
-    except Exception:
-        return f"[LLM error] {data}"
+# Asíncrono y con conexiones keep-alive compartidas: una respuesta lenta del
+# LLM ya no bloquea el event loop (ni a los demás usuarios).
+llm = backend_from_env()
+
+async def chat_groq(messages, temperature=0.3, max_tokens=400):
+    with STAGE_SECONDS.medir(stage="llm"):
+        return await llm.chat(messages, temperature=temperature, max_tokens=max_tokens)
 
-def groq_grounded_summary(user_msg: str, tool_name: str, tool_json: dict|list, zona: str|None = None) -> str:
+def grounded_messages(user_msg: str, tool_name: str, tool_json: dict|list, zona: str|None = None) -> list:
     data_block = json.dumps(tool_json, ensure_ascii=False, indent=2)
     sys_inst = (
         "Eres un asistente para una distribuidora de arena para gato en Guatemala. "
@@ -44,32 +52,93 @@ DATA:
 Instrucciones:
 - Resume y presenta los resultados de DATA en viñetas.
 - Si DATA es una lista de tiendas, muestra Nombre, Calle, Ciudad y Zona.
+- Si DATA trae 'items' y 'total', 'items' son las primeras tiendas de 'total': preséntalas y aclara cuántas hay en total.
 - Si DATA es un objeto con 'disponibilidad' y 'sugeridos', resume disponibilidad y luego lista sugeridos.
+- Si TOOL nombra varias herramientas, DATA trae una clave por herramienta: presenta cada parte.
 - No agregues información que no esté en DATA.
 - Si no hay datos, explica que no se encontró y sugiere dar otra zona o punto de referencia."""
-    msgs = [{"role":"system","content":sys_inst},
+    return [{"role":"system","content":sys_inst},
             {"role":"user","content":user_prompt}]
-    return chat_groq(msgs, temperature=0.2, max_tokens=500)
+
+# Resultados pequeños se responden con plantilla y los resúmenes del LLM se
+# reutilizan mientras el JSON de la herramienta sea el mismo.
+SUMMARY_TEMPLATE_MAX = int(os.getenv("SUMMARY_TEMPLATE_MAX", "3"))
+resumen_cache = cache_from_env()
+
+def _stat_resumen(clave: str):
+    return lambda: resumen_cache.stats()[clave]
+
+metricas.contador("summary_cache_hits_total", "Resumenes servidos desde la cache.", fn=_stat_resumen("hits"))
+metricas.contador("summary_cache_misses_total", "Resumenes que fueron al LLM.", fn=_stat_resumen("misses"))
+metricas.contador("summary_templated_total", "Respuestas resueltas con plantilla, sin LLM.", fn=_stat_resumen("templated"))
+metricas.medidor("summary_cache_entries", "Entradas en la cache de resumenes.", fn=_stat_resumen("size"))
+
+def turno_anclado(user_msg: str, tool_name: str, args: dict, tool_json: dict|list,
+                  zona: str|None = None, cacheable: bool = True) -> dict:
+    """
+    Turno con DATA de herramientas: si hay plantilla o resumen en caché trae
+    ya la "respuesta"; si no, los mensajes para el LLM y la clave donde
+    guardar lo que conteste. Si alguna llamada MCP falló (cacheable=False),
+    DATA trae datos de reserva: ni plantilla ni caché, como antes decide el LLM.
+    """
+    if not cacheable:
+        return {"messages": grounded_messages(user_msg, tool_name, tool_json, zona),
+                "temperature": 0.2, "max_tokens": 500, "historial": None, "cache_key": None}
+    if "+" in tool_name:
+        partes = [plantilla(n, tool_json[n], zona, SUMMARY_TEMPLATE_MAX) for n in tool_name.split("+")]
+        texto = None if None in partes else "\n\n".join(partes)
+    else:
+        texto = plantilla(tool_name, tool_json, zona, SUMMARY_TEMPLATE_MAX)
+    if texto is not None:
+        resumen_cache.contar_plantilla()
+        return {"respuesta": texto, "historial": None}
+    resumen_cache.sincronizar(mcp_pool.data_version)
+    key = clave_resumen(tool_name, args, tool_json)
+    texto = resumen_cache.get(key)
+    if texto is not None:
+        return {"respuesta": texto, "historial": None}
+    msgs = grounded_messages(user_msg, tool_name, tool_json, zona)
+    return {"messages": msgs, "temperature": 0.2, "max_tokens": 500,
+            "historial": None, "cache_key": key}
+
+async def groq_grounded_summary(user_msg: str, tool_name: str, tool_json: dict|list, zona: str|None = None,
+                                args: dict|None = None) -> str:
+    turno = turno_anclado(user_msg, tool_name, args or {}, tool_json, zona)
+    if "respuesta" in turno:
+        return turno["respuesta"]
+    respuesta = await chat_groq(turno["messages"], temperature=0.2, max_tokens=500)
+    await cerrar_turno(turno, respuesta)
+    return respuesta
 
 # ========= MCP (WebSocket JSON-RPC) =========
-async def mcp_init(ws):
-    await ws.send(json.dumps({"jsonrpc":"2.0","id":1,"method":"initialize","params":{}}))
-    _ = json.loads(await ws.recv())
-    await ws.send(json.dumps({"jsonrpc":"2.0","id":2,"method":"tools/list","params":{}}))
-    _ = json.loads(await ws.recv())
-
-async def mcp_call(ws, name: str, arguments: dict):
-    req = {"jsonrpc":"2.0","id":3,"method":"tools/call","params":{"name":name,"arguments":arguments}}
-    await ws.send(json.dumps(req))
-    data = json.loads(await ws.recv())
-    if "error" in data:
-        raise RuntimeError(data["error"])
-    return data["result"]
+# Conexiones persistentes: el handshake se paga una vez por conexión y no en
+# cada mensaje del chat.
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+mcp_pool = MCPPool(
+    MCP_URL,
+    size=MCP_POOL_SIZE,
+    timeout=float(os.getenv("MCP_TIMEOUT", "15")),
+    health_interval=float(os.getenv("MCP_HEALTH_SEG", "20")),
+)
 
 async def call_mcp_tool(name: str, arguments: dict):
-    async with websockets.connect(MCP_URL, subprotocols=["jsonrpc"]) as ws:
-        await mcp_init(ws)
-        return await mcp_call(ws, name, arguments)
+    t0 = time.perf_counter()
+    try:
+        return await mcp_pool.call_tool(name, arguments)
+    except Exception:
+        MCP_CALL_ERRORS.inc(tool=name)
+        raise
+    finally:
+        MCP_CALL_SECONDS.observe(time.perf_counter() - t0, tool=name)
+
+def _stat_pool(clave: str):
+    return lambda: mcp_pool.stats()[clave]
+
+metricas.contador("mcp_pool_calls_total", "Llamadas hechas por el pool MCP.", fn=_stat_pool("calls"))
+metricas.contador("mcp_pool_reused_calls_total", "Llamadas que reutilizaron una conexion abierta.", fn=_stat_pool("reused_calls"))
+metricas.contador("mcp_pool_handshakes_total", "Handshakes (connect + initialize) hechos.", fn=_stat_pool("handshakes"))
+metricas.contador("mcp_pool_handshake_seconds_total", "Tiempo total gastado en handshakes.", fn=_stat_pool("handshake_seconds"))
+metricas.medidor("mcp_pool_alive", "Conexiones MCP vivas en el pool.", fn=_stat_pool("alive"))
 
 # ========= Utilidades =========
 def extract_zona(text: str) -> str|None:
@@ -77,19 +146,13 @@ def extract_zona(text: str) -> str|None:
     return m.group(1) if m else None
 
 # ========= Estado de conversación por sesión =========
-SESSIONS: Dict[str, list] = {}
-
-def get_historial(session_id: str) -> list:
-    if session_id not in SESSIONS:
-        SESSIONS[session_id] = [{
-            "role":"system","content":(
-                "Eres un asistente para una distribuidora de arena para gato en Guatemala. "
-                "Cuando NO se te proporciona DATA de herramientas, responde brevemente "
-                "pidiendo zona o referencia. No inventes datos concretos. "
-                "Cuando se te proporcione DATA, se usará otro prompt para anclarte."
-            )
-        }]
-    return SESSIONS[session_id]
+# Acotado: tope de sesiones (LRU), TTL por inactividad e historial recortado a
+# un presupuesto de tokens; SESSION_BACKEND=sqlite lo comparte entre workers.
+sesiones = store_from_env()
+
+async def get_historial(session_id: str) -> list:
+    with STAGE_SECONDS.medir(stage="session_load"):
+        return await sesiones.cargar(session_id)
 
 # ========= FastAPI app =========
 app = FastAPI(title="Cliente Web - MCP + Groq")
@@ -178,6 +241,17 @@ HTML_PAGE = """<!doctype html>
     wrap.textContent = text;
     chat.appendChild(wrap);
     chat.scrollTop = chat.scrollHeight;
+    return wrap;
+  }
+
+  // Un evento SSE: líneas "event: x" / "data: {...}"
+  function parseEvent(block){
+    let event = 'message', data = '';
+    for(const line of block.split('\\n')){
+      if(line.startsWith('event:')) event = line.slice(6).trim();
+      else if(line.startsWith('data:')) data += line.slice(5).trim();
+    }
+    return { event, data: data ? JSON.parse(data) : {} };
   }
 
   async function sendMessage(){
@@ -187,20 +261,37 @@ HTML_PAGE = """<!doctype html>
     addBubble(text, 'me');
     btn.disabled = true;
 
+    // La respuesta se va pintando a medida que llegan los tokens
+    const bubble = addBubble('…', 'bot');
+    let reply = '';
     try{
-      const resp = await fetch('/chat', {
+      const resp = await fetch('/chat/stream', {
         method:'POST',
         headers: {'Content-Type':'application/json'},
         body: JSON.stringify({ sessionId, message: text })
       });
-      const data = await resp.json();
-      if(data && data.reply){
-        addBubble(data.reply, 'bot');
-      }else{
-        addBubble('[Error] Respuesta vacía', 'bot');
+      if(!resp.ok || !resp.body) throw new Error('HTTP ' + resp.status);
+      const reader = resp.body.getReader();
+      const decoder = new TextDecoder();
+      let buf = '';
+      while(true){
+        const { value, done } = await reader.read();
+        if(done) break;
+        buf += decoder.decode(value, { stream:true });
+        let i;
+        while((i = buf.indexOf('\\n\\n')) >= 0){
+          const ev = parseEvent(buf.slice(0, i));
+          buf = buf.slice(i + 2);
+          if(ev.event === 'message' && ev.data.delta){
+            reply += ev.data.delta;
+            bubble.textContent = reply;
+            chat.scrollTop = chat.scrollHeight;
+          }
+        }
       }
+      if(!reply) bubble.textContent = '[Error] Respuesta vacía';
     }catch(e){
-      addBubble('[Error de red] ' + e, 'bot');
+      bubble.textContent = reply ? reply + '\\n[Error de red] ' + e : '[Error de red] ' + e;
     }finally{
       btn.disabled = false;
       input.focus();
@@ -222,54 +313,165 @@ HTML_PAGE = """<!doctype html>
 async def index():
     return HTML_PAGE
 
-@app.post("/chat")
-async def chat_api(req: Request):
+@app.get("/stats")
+async def stats():
+    return JSONResponse({"mcp_pool": mcp_pool.stats(), "sessions": sesiones.stats(),
+                         "summaries": resumen_cache.stats()})
+
+@app.get("/metrics")
+async def metrics():
+    return Response(metricas.exponer(), media_type=metricas.CONTENT_TYPE)
+
+@app.on_event("shutdown")
+async def _cerrar_conexiones():
+    await mcp_pool.close()
+    await llm.close()
+
+# Tiendas por zona que se piden al servidor MCP (y que terminan en el prompt);
+# el total real llega en la respuesta
+ZONA_LIMITE = int(os.getenv("MCP_ZONA_LIMITE", "20"))
+
+# Respuesta de reserva por herramienta si la llamada MCP falla
+SIN_DATOS = {
+    "find_stores_by_zone": lambda args: [{"Nombre":"(sin datos)","Calle":"-","Ciudad":"-","Zona":args.get("zone")}],
+    "recommend_complements": lambda args: {"disponibilidad":[],"sugeridos":[]},
+}
+
+def planear(user: str) -> list:
+    """
+    Herramientas que pide el mensaje, como [(nombre, argumentos), ...]. Una
+    consulta compuesta ("recomienda complementos Bionic zona 15") lleva ambas.
+    """
+    zona_num = extract_zona(user)
+    pedir_complementos = any(k in user.lower() for k in ["complemento", "complementarios", "recomienda", "recomendar"])
+    plan = []
+    if zona_num:
+        plan.append(("find_stores_by_zone", {"zone": zona_num, "limit": ZONA_LIMITE}))
+    if pedir_complementos:
+        args = {"product_name": user}
+        if zona_num:
+            args["zone"] = zona_num
+        plan.append(("recommend_complements", args))
+    return plan
+
+async def turno_con_herramientas(user: str, plan: list, zona: str|None) -> dict:
+    """
+    Ejecuta todas las herramientas del plan a la vez (la latencia es la de la
+    más lenta, no la suma) y arma un único turno anclado con sus datos.
+    """
+    with STAGE_SECONDS.medir(stage="tools"):
+        res = await asyncio.gather(*(call_mcp_tool(n, a) for n, a in plan), return_exceptions=True)
+    ok = not any(isinstance(r, BaseException) for r in res)
+    datos = [SIN_DATOS[n](a) if isinstance(r, BaseException) else r for (n, a), r in zip(plan, res)]
+    if len(plan) == 1:
+        (nombre, args), = plan
+        return turno_anclado(user, nombre, args, datos[0], zona, cacheable=ok)
+    nombre = "+".join(n for n, _ in plan)
+    args = {n: a for n, a in plan}
+    return turno_anclado(user, nombre, args, {n: d for (n, _), d in zip(plan, datos)}, zona, cacheable=ok)
+
+async def preparar_turno(session_id: str, user: str) -> dict:
+    """
+    Llama a las herramientas MCP que correspondan y arma la llamada al LLM
+    del turno: messages, temperature, max_tokens y, si la respuesta debe
+    quedar en el historial de la sesión, "historial". Si la respuesta ya se
+    conoce (plantilla o caché), viene en "respuesta" y no se llama al LLM.
+    """
+    plan = planear(user)
+    if plan:
+        return await turno_con_herramientas(user, plan, extract_zona(user))
+
+    historial = await get_historial(session_id)
+    historial.append({"role":"user","content":user})
+    msgs = recortar_historial(historial, sesiones.max_tokens)
+    return {"messages": msgs, "temperature": 0.4, "max_tokens": 200,
+            "historial": historial, "sessionId": session_id}
+
+async def cerrar_turno(turno: dict, respuesta: str):
+    # un stream cortado deja el aviso al final, no al principio
+    if turno.get("cache_key") and "[LLM error]" not in respuesta:
+        resumen_cache.put(turno["cache_key"], respuesta)
+    if turno["historial"] is not None:
+        turno["historial"].append({"role":"assistant","content":respuesta})
+        with STAGE_SECONDS.medir(stage="session_save"):
+            await sesiones.guardar(turno["sessionId"], turno["historial"])
+
+async def _leer_mensaje(req: Request) -> tuple:
     payload = await req.json()
     session_id = payload.get("sessionId") or str(uuid.uuid4())
     user = (payload.get("message") or "").strip()
+    return session_id, user
+
+@app.post("/chat")
+async def chat_api(req: Request):
+    CHAT_INFLIGHT.inc()
+    try:
+        with CHAT_SECONDS.medir(endpoint="/chat"):
+            return await _chat(req)
+    finally:
+        CHAT_INFLIGHT.dec()
+
+async def _chat(req: Request):
+    session_id, user = await _leer_mensaje(req)
     if not user:
         return JSONResponse({"reply":"(mensaje vacío)"})
 
-    historial = get_historial(session_id)
+    turno = await preparar_turno(session_id, user)
+    if "respuesta" in turno:
+        return JSONResponse({"reply": turno["respuesta"], "sessionId": session_id})
+    respuesta = await chat_groq(turno["messages"], temperature=turno["temperature"], max_tokens=turno["max_tokens"])
+    await cerrar_turno(turno, respuesta)
+    return JSONResponse({"reply": respuesta, "sessionId": session_id})
 
-    zona_num = extract_zona(user)
-    pedir_complementos = any(k in user.lower() for k in ["complemento", "complementarios", "recomienda", "recomendar"])
+def _sse(data: dict, event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-    if zona_num:
-        try:
-            tiendas = await call_mcp_tool("find_stores_by_zone", {"zone": zona_num})
-        except Exception as e:
-            tiendas = [{"Nombre":"(sin datos)","Calle":"-","Ciudad":"-","Zona":zona_num}]
-        respuesta = groq_grounded_summary(
-            user_msg=user,
-            tool_name="find_stores_by_zone",
-            tool_json=tiendas,
-            zona=zona_num
-        )
-        return JSONResponse({"reply": respuesta, "sessionId": session_id})
+@app.post("/chat/stream")
+async def chat_stream(req: Request):
+    """
+    Igual que /chat pero enviando los tokens del LLM como server-sent events
+    a medida que llegan: eventos "data: {"delta": ...}" y al final
+    "event: done" con el sessionId.
+    """
+    session_id, user = await _leer_mensaje(req)
 
-    if pedir_complementos:
-        zona_opt = extract_zona(user)
-        product_name = user
-        args = {"product_name": product_name}
-        if zona_opt:
-            args["zone"] = zona_opt
+    async def eventos():
+        CHAT_INFLIGHT.inc()
+        t0 = time.perf_counter()
         try:
-            comp = await call_mcp_tool("recommend_complements", args)
-        except Exception as e:
-            comp = {"disponibilidad":[],"sugeridos":[]}
-        respuesta = groq_grounded_summary(
-            user_msg=user,
-            tool_name="recommend_complements",
-            tool_json=comp,
-            zona=zona_opt
-        )
-        return JSONResponse({"reply": respuesta, "sessionId": session_id})
+            async for ev in _eventos():
+                yield ev
+        finally:
+            CHAT_INFLIGHT.dec()
+            CHAT_SECONDS.observe(time.perf_counter() - t0, endpoint="/chat/stream")
 
-    historial.append({"role":"user","content":user})
-    base = chat_groq(historial, temperature=0.4, max_tokens=200)
-    historial.append({"role":"assistant","content":base})
-    return JSONResponse({"reply": base, "sessionId": session_id})
+    async def _eventos():
+        if not user:
+            yield _sse({"delta": "(mensaje vacío)"})
+            yield _sse({"sessionId": session_id}, event="done")
+            return
+        turno = await preparar_turno(session_id, user)
+        if "respuesta" in turno:
+            yield _sse({"delta": turno["respuesta"]})
+            yield _sse({"sessionId": session_id}, event="done")
+            return
+        partes = []
+        t0 = time.perf_counter()
+        async for delta in llm.stream(turno["messages"], temperature=turno["temperature"], max_tokens=turno["max_tokens"]):
+            if not partes:
+                STAGE_SECONDS.observe(time.perf_counter() - t0, stage="llm_first_token")
+            partes.append(delta)
+            yield _sse({"delta": delta})
+        STAGE_SECONDS.observe(time.perf_counter() - t0, stage="llm")
+        await cerrar_turno(turno, "".join(partes).strip())
+        yield _sse({"sessionId": session_id}, event="done")
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 if __name__ == "__main__":
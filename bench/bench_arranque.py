@@ -0,0 +1,66 @@
+# bench/bench_arranque.py
+# Tiempo de arranque de Inventario: parseo del CSV (y escritura del snapshot)
+# contra carga del snapshot binario con mmap, sobre un CSV sintético.
+#
+#   python bench/bench_arranque.py [--stores 5000] [--products 50] [--repeat 3]
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import inventario  # noqa: E402
+from sinteticos import generar  # noqa: E402
+from inventario import Inventario  # noqa: E402
+
+def cargar(path: Path) -> tuple:
+    t0 = time.perf_counter()
+    inv = Inventario(str(path), recarga_seg=0)
+    return time.perf_counter() - t0, inv
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stores", type=int, default=5000)
+    ap.add_argument("--products", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=3)
+    a = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "inventario.csv"
+        generar(path, a.stores, a.products)
+        snap = Path(f"{path}.snap")
+
+        inventario.SNAPSHOT = False
+        csv_seg = [cargar(path)[0] for _ in range(a.repeat)]
+
+        inventario.SNAPSHOT = True
+        escritura, inv = cargar(path)
+        assert inv.estado()["origen_datos"] == "csv"
+        snap_seg = []
+        for _ in range(a.repeat):
+            dt, inv2 = cargar(path)
+            assert inv2.estado()["origen_datos"] == "snapshot"
+            snap_seg.append(dt)
+
+        zonas = [str(z) for z in range(27)]
+        iguales = all(inv.buscar_tiendas_en_zona(z) == inv2.buscar_tiendas_en_zona(z) for z in zonas)
+        iguales &= all(inv.recomendar_complementos(p, z) == inv2.recomendar_complementos(p, z)
+                       for p in ("bionic", "arena mish") for z in (None, "10"))
+
+        print(json.dumps({
+            "filas": inv.estado()["filas"],
+            "csv_mb": round(path.stat().st_size / 2**20, 2),
+            "snapshot_mb": round(snap.stat().st_size / 2**20, 2),
+            "csv_seg": round(statistics.median(csv_seg), 3),
+            "csv_y_escritura_snapshot_seg": round(escritura, 3),
+            "snapshot_seg": round(statistics.median(snap_seg), 3),
+            "aceleracion": round(statistics.median(csv_seg) / statistics.median(snap_seg), 1),
+            "resultados_identicos": iguales,
+        }, indent=2))
+
+if __name__ == "__main__":
+    main()
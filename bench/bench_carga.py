@@ -0,0 +1,65 @@
+# bench/bench_carga.py
+# Carga del CSV de inventario de una vez contra por trozos (y con pool de
+# procesos): filas/seg, pico de memoria de la carga (tracemalloc) y
+# verificación de que los registros resultantes son los mismos.
+#
+#   python bench/bench_carga.py [--stores 5000] [--products 50] [--trozo 20000] [--procesos 2]
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import inventario  # noqa: E402
+from sinteticos import generar  # noqa: E402
+from inventario import Inventario  # noqa: E402
+
+def cargar(path: Path, trozo: int, procesos: int) -> tuple:
+    inventario.TROZO_FILAS = trozo
+    inventario.CARGA_PROCESOS = procesos
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    inv = Inventario(str(path), recarga_seg=0)
+    dt = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    filas = inv.estado()["filas"]
+    return inv, {"seg": round(dt, 3), "filas_por_seg": round(filas / dt),
+                 "pico_mb": round(pico / 2**20, 1)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stores", type=int, default=5000)
+    ap.add_argument("--products", type=int, default=50)
+    ap.add_argument("--trozo", type=int, default=20000)
+    ap.add_argument("--procesos", type=int, default=2)
+    a = ap.parse_args()
+    inventario.SNAPSHOT = False
+
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "inventario.csv"
+        generar(path, a.stores, a.products)
+        res = {"filas": None, "csv_mb": round(path.stat().st_size / 2**20, 2)}
+        invs = {}
+        for nombre, trozo, procesos in (("entero", 0, 0), ("trozos", a.trozo, 0),
+                                        ("trozos_procesos", a.trozo, a.procesos)):
+            invs[nombre], res[nombre] = cargar(path, trozo, procesos)
+        res["filas"] = invs["entero"].estado()["filas"]
+
+        ref = invs["entero"]
+        iguales = True
+        for inv in (invs["trozos"], invs["trozos_procesos"]):
+            iguales &= all(ref.buscar_tiendas_en_zona(str(z)) == inv.buscar_tiendas_en_zona(str(z))
+                           for z in range(27))
+            iguales &= all(ref.recomendar_complementos(p, z) == inv.recomendar_complementos(p, z)
+                           for p in ("bionic", "arena mish", "k-nino") for z in (None, "10"))
+            iguales &= ref.buscar_productos("bionik bal") == inv.buscar_productos("bionik bal")
+        res["resultados_identicos"] = iguales
+    print(json.dumps(res, indent=2))
+
+if __name__ == "__main__":
+    main()
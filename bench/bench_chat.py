@@ -0,0 +1,69 @@
+# bench/bench_chat.py
+# Carga sobre POST /chat (o /chat/stream con --stream) del cliente web:
+# U usuarios concurrentes, cada uno con su sessionId, y latencia total,
+# tiempo al primer byte (TTFB) y throughput resultantes. Con el LLM falso
+# (bench/fake_llm.py) el throughput debe crecer con U en vez de quedar fijo
+# en 1/FAKE_LLM_DELAY, y con --stream el TTFB baja a ~FAKE_LLM_TTFT.
+#
+#   python bench/bench_chat.py --url http://127.0.0.1:8080 --users 20 --turns 3 [--stream]
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+MENSAJES = ["hola", "¿qué tiendas hay en zona 10?", "recomienda complementos Bionic zona 15"]
+
+def percentil(xs: list, p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, max(0, round(p / 100 * len(xs)) - 1))]
+
+async def usuario(http: httpx.AsyncClient, turns: int, stream: bool, lat: list, ttfb: list):
+    sid = str(uuid.uuid4())
+    ruta = "/chat/stream" if stream else "/chat"
+    for i in range(turns):
+        body = {"sessionId": sid, "message": MENSAJES[i % len(MENSAJES)]}
+        t0 = time.perf_counter()
+        primero = None
+        async with http.stream("POST", ruta, json=body) as r:
+            r.raise_for_status()
+            async for _ in r.aiter_raw():
+                if primero is None:
+                    primero = time.perf_counter() - t0
+        lat.append(time.perf_counter() - t0)
+        ttfb.append(primero if primero is not None else lat[-1])
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:8080")
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--turns", type=int, default=3)
+    ap.add_argument("--stream", action="store_true", help="usar /chat/stream (SSE)")
+    a = ap.parse_args()
+
+    lat: list = []
+    ttfb: list = []
+    limits = httpx.Limits(max_connections=a.users)
+    async with httpx.AsyncClient(base_url=a.url, timeout=120, limits=limits) as http:
+        t0 = time.perf_counter()
+        await asyncio.gather(*[usuario(http, a.turns, a.stream, lat, ttfb) for _ in range(a.users)])
+        total = time.perf_counter() - t0
+
+    print(json.dumps({
+        "endpoint": "/chat/stream" if a.stream else "/chat",
+        "users": a.users,
+        "requests": len(lat),
+        "throughput_rps": round(len(lat) / total, 2),
+        "p50_ms": round(percentil(lat, 50) * 1000, 1),
+        "p95_ms": round(percentil(lat, 95) * 1000, 1),
+        "p99_ms": round(percentil(lat, 99) * 1000, 1),
+        "ttfb_p50_ms": round(percentil(ttfb, 50) * 1000, 1),
+        "ttfb_p95_ms": round(percentil(ttfb, 95) * 1000, 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+# bench/bench_json.py
+# Bytes/seg codificando la respuesta de find_stores_by_zone para una zona
+# grande: json.dumps estándar (lo que hacía ws_mcp), codec.dumps (orjson si
+# está instalado) y el fragmento precalculado por snapshot, donde solo se
+# arma el sobre JSON-RPC.
+#
+#   python bench/bench_json.py [--rows 50000] [--iters 20]
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import codec  # noqa: E402
+from codec import RawJSON  # noqa: E402
+
+def registros(n: int) -> list:
+    return [
+        {"Nombre": f"Tienda {i}", "Calle": f"{i % 40} Avenida {i % 97}-{i % 13} Zona 8",
+         "Ciudad": "Guatemala", "Zona": "8", "Producto": "ARENA MISH LIMÓN",
+         "Stock": str(i % 120), "Codigo": "M11-LI"}
+        for i in range(n)
+    ]
+
+def medir(fn, iters: int) -> tuple:
+    nbytes = 0
+    t0 = time.perf_counter()
+    for i in range(iters):
+        nbytes += len(fn(i).encode("utf-8"))
+    dt = time.perf_counter() - t0
+    return nbytes / dt, dt / iters
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--iters", type=int, default=20)
+    a = ap.parse_args()
+
+    recs = registros(a.rows)
+    fragmento = RawJSON(codec.dumps(recs))
+
+    casos = {
+        "json.dumps (stdlib)": lambda i: json.dumps({"jsonrpc": "2.0", "id": i, "result": recs}),
+        f"codec.dumps ({'orjson' if codec.orjson else 'stdlib'})":
+            lambda i: codec.encode_response({"jsonrpc": "2.0", "id": i, "result": recs}),
+        "fragmento precalculado":
+            lambda i: codec.encode_response({"jsonrpc": "2.0", "id": i, "result": fragmento}),
+    }
+    base = None
+    for nombre, fn in casos.items():
+        bps, por_llamada = medir(fn, a.iters)
+        base = base or bps
+        print(f"{nombre:<26} {bps / 1e6:>10,.1f} MB/s  {por_llamada * 1000:>8.2f} ms/resp  x{bps / base:.1f}")
+
+if __name__ == "__main__":
+    main()
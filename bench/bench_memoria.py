@@ -0,0 +1,66 @@
+# bench/bench_memoria.py
+# Memoria del DataFrame del inventario con y sin la representación compacta
+# (INVENTARIO_COMPACTO), sobre un CSV sintético tiendas x productos, y
+# verificación de que las API públicas devuelven los mismos registros.
+#
+#   python bench/bench_memoria.py [--stores 2000] [--products 50]
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import inventario  # noqa: E402
+from inventario import Inventario  # noqa: E402
+from sinteticos import generar  # noqa: E402
+
+def medir(csv_path: Path, compacto: bool):
+    inventario.COMPACTO = compacto
+    t0 = time.perf_counter()
+    inv = Inventario(str(csv_path), recarga_seg=0)
+    carga = time.perf_counter() - t0
+    df = inv._snap.datos.df
+    return inv, {"carga_seg": round(carga, 3), "filas": len(df),
+                 "bytes": int(df.memory_usage(deep=True).sum())}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stores", type=int, default=2000)
+    ap.add_argument("--products", type=int, default=50)
+    a = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "inventario.csv"
+        generar(path, a.stores, a.products)
+        inv_obj, obj = medir(path, False)
+        inv_cmp, cmp_ = medir(path, True)
+
+        consultas = [("zona", z) for z in map(str, range(0, 27))]
+        consultas += [("producto", p, z) for p in ("bionic", "arena mish", "P-00003", "xyz")
+                      for z in (None, "10")]
+        iguales = True
+        t = {False: 0.0, True: 0.0}
+        for q in consultas:
+            for compacto, inv in ((False, inv_obj), (True, inv_cmp)):
+                t0 = time.perf_counter()
+                if q[0] == "zona":
+                    r = inv.buscar_tiendas_en_zona(q[1])
+                else:
+                    r = inv.recomendar_complementos(q[1], q[2])
+                t[compacto] += time.perf_counter() - t0
+                if compacto:
+                    iguales &= r == prev
+                prev = r
+
+    print(json.dumps({
+        "objeto": obj, "compacto": cmp_,
+        "reduccion": round(1 - cmp_["bytes"] / obj["bytes"], 3),
+        "consultas_seg": {"objeto": round(t[False], 3), "compacto": round(t[True], 3)},
+        "registros_identicos": iguales,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
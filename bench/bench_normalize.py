@@ -0,0 +1,71 @@
+# bench/bench_normalize.py
+# Micro-benchmark de normalize_text: filas/seg de la versión original
+# (NFD + re.sub en cada llamada) contra la actual (translate + LRU).
+#
+#   python bench/bench_normalize.py [--rows 200000] [--distinct 5000]
+import argparse
+import random
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import inventario  # noqa: E402
+from inventario import normalize_text  # noqa: E402
+
+def normalize_text_original(s: str) -> str:
+    if not s:
+        return ""
+    s = s.lower()
+    s = "".join(
+        c for c in unicodedata.normalize("NFD", s)
+        if unicodedata.category(c) != "Mn"
+    )
+    s = re.sub(r"[-_/]", " ", s)
+    s = re.sub(r"[^a-z0-9\s\.]", " ", s)
+    s = re.sub(r"\b(juguetes)\b", "juguete", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+BASES = [
+    "ARENA L-FAVOURITE CAFÉ", "ARENA MISH LIMÓN", "BIONIC TOSS-N-TUG",
+    "K-NINO ADULTO (20kg)", "BIO STONES MANZANA (8kg)", "Juguetes p/ gato",
+]
+
+def filas(n: int, distinct: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    nombres = [f"{rnd.choice(BASES)} #{i}" for i in range(distinct)]
+    return [rnd.choice(nombres) for _ in range(n)]
+
+def medir(fn, datos) -> float:
+    t0 = time.perf_counter()
+    for s in datos:
+        fn(s)
+    return len(datos) / (time.perf_counter() - t0)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--distinct", type=int, default=5_000,
+                    help="nombres distintos (un inventario repite productos entre tiendas)")
+    a = ap.parse_args()
+
+    datos = filas(a.rows, a.distinct)
+    unicos = filas(a.rows, a.rows, seed=1)
+
+    res = {
+        "original": medir(normalize_text_original, datos),
+        "actual_sin_cache": medir(inventario._normalize.__wrapped__, datos),
+        "actual_repetidos": medir(normalize_text, datos),
+    }
+    inventario._normalize.cache_clear()
+    res["actual_todos_distintos"] = medir(normalize_text, unicos)
+
+    for k, v in res.items():
+        print(f"{k:<24} {v:>12,.0f} filas/s  x{v / res['original']:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# bench/comun.py
+# Utilidades compartidas por los benchmarks: percentiles y memoria residente.
+import os
+from typing import Dict, List, Optional
+
+def percentil(xs: List[float], p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    k = min(len(xs) - 1, max(0, round(p / 100 * len(xs)) - 1))
+    return xs[k]
+
+def resumen(lat: List[float], total_seg: float) -> Dict[str, float]:
+    """Throughput y percentiles (ms) de una lista de latencias en segundos."""
+    return {
+        "calls": len(lat),
+        "throughput_rps": round(len(lat) / total_seg, 1) if total_seg > 0 else 0.0,
+        "p50_ms": round(percentil(lat, 50) * 1000, 3),
+        "p95_ms": round(percentil(lat, 95) * 1000, 3),
+        "p99_ms": round(percentil(lat, 99) * 1000, 3),
+        "max_ms": round(max(lat, default=0) * 1000, 3),
+    }
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Memoria residente actual (Linux, /proc); None si no se puede leer."""
+    try:
+        with open(f"/proc/{pid or os.getpid()}/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return round(int(linea.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
@@ -0,0 +1,53 @@
+# bench/fake_llm.py
+# Servidor local que imita /chat/completions de una API tipo OpenAI, con
+# latencia configurable. Sirve para pruebas y benchmarks del cliente web sin
+# gastar tokens:
+#
+#   FAKE_LLM_DELAY=1.0 uvicorn bench.fake_llm:app --port 9000
+#   LLM_BASE_URL=http://127.0.0.1:9000/v1 python web_client_server.py
+import asyncio
+import json
+import os
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DELAY = float(os.getenv("FAKE_LLM_DELAY", "1.0"))
+# con "stream": true el primer token sale a los TTFT segundos y el resto se
+# reparte hasta completar DELAY
+TTFT = float(os.getenv("FAKE_LLM_TTFT", str(DELAY / 10)))
+TOKENS = 20
+
+app = FastAPI(title="LLM falso")
+
+def _respuesta(body: dict) -> str:
+    user = next((m["content"] for m in reversed(body.get("messages", [])) if m["role"] == "user"), "")
+    return f"(respuesta simulada a {len(user)} caracteres de prompt)"
+
+async def _stream(body: dict):
+    palabras = (_respuesta(body) + " ").split(" ")
+    trozos = [" ".join(palabras[i::TOKENS]) for i in range(TOKENS)]
+    await asyncio.sleep(TTFT)
+    for i, t in enumerate(trozos):
+        if i:
+            await asyncio.sleep(max(0.0, DELAY - TTFT) / (TOKENS - 1))
+        chunk = {"id": "fake", "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": {"content": t + " "}}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+@app.post("/v1/chat/completions")
+async def completions(req: Request):
+    body = await req.json()
+    if body.get("stream"):
+        return StreamingResponse(_stream(body), media_type="text/event-stream")
+    await asyncio.sleep(DELAY)
+    return JSONResponse({
+        "id": "fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": _respuesta(body)}}],
+    })
@@ -0,0 +1,118 @@
+# bench/load_ws.py
+# Prueba de carga del servidor MCP: N sockets concurrentes, cada uno enviando
+# requests en serie, y percentiles de latencia por llamada. El tráfico sale de
+# una mezcla fija de tools/call o de un archivo JSONL (--replay) con un
+# mensaje JSON-RPC por línea (objeto, batch, o el atajo {"name","arguments"}).
+#
+#   uvicorn mcp_server:app --port 8000            # MCP_EXECUTOR=inline para el "antes"
+#   python bench/load_ws.py --url ws://127.0.0.1:8000/mcp --clients 50 --requests 20
+#   python bench/load_ws.py --replay bench/replay_ejemplo.jsonl --clients 100
+import argparse
+import asyncio
+import json
+import random
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+import websockets
+
+from comun import resumen, rss_mb
+
+CALLS = [
+    ("find_stores_by_zone", {"zone": "0"}),
+    ("find_stores_by_zone", {"zone": "8"}),
+    ("recommend_complements", {"product_name": "bionic ball", "zone": "10"}),
+    ("recommend_complements", {"product_name": "arena mish"}),
+    ("search_products", {"query": "bionik bal"}),
+]
+
+def _tool_call(name: str, args: dict) -> dict:
+    return {"jsonrpc": "2.0", "id": 0, "method": "tools/call",
+            "params": {"name": name, "arguments": args}}
+
+def leer_replay(path: str) -> List[Any]:
+    msgs = []
+    with open(path, encoding="utf-8") as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            m = json.loads(linea)
+            if isinstance(m, dict) and "method" not in m and "name" in m:
+                m = _tool_call(m["name"], m.get("arguments") or {})
+            msgs.append(m)
+    return msgs
+
+def _con_ids(msg: Any, siguiente) -> tuple:
+    """Copia del mensaje con ids nuevos; devuelve (mensaje, ids esperados)."""
+    partes = msg if isinstance(msg, list) else [msg]
+    nuevas, ids = [], set()
+    for p in partes:
+        p = dict(p)
+        if "id" in p:  # sin "id" es notificación: no hay respuesta
+            p["id"] = next(siguiente)
+            ids.add(p["id"])
+        nuevas.append(p)
+    return (nuevas if isinstance(msg, list) else nuevas[0]), ids
+
+async def cliente(url: str, n: int, lat: list, errores: list, seed: int,
+                  replay: Optional[List[Any]] = None):
+    rnd = random.Random(seed)
+    siguiente = iter(range(1, 1 << 62))
+    async with websockets.connect(url, subprotocols=["jsonrpc"], max_size=None) as ws:
+        for i in range(n):
+            if replay:
+                # cada cliente recorre el archivo desde un punto distinto
+                base = replay[(seed + i) % len(replay)]
+            else:
+                base = _tool_call(*rnd.choice(CALLS))
+            msg, ids = _con_ids(base, siguiente)
+            t0 = time.perf_counter()
+            await ws.send(json.dumps(msg))
+            while ids:
+                data = json.loads(await ws.recv())
+                for resp in data if isinstance(data, list) else [data]:
+                    ids.discard(resp.get("id"))
+                    if "error" in resp:
+                        errores.append(resp["error"].get("code"))
+            lat.append(time.perf_counter() - t0)
+
+def rss_servidor(url: str) -> Optional[float]:
+    """Pico de RSS que informa el servidor en /status (ws://h/mcp -> http://h/status)."""
+    http = url.replace("wss://", "https://").replace("ws://", "http://").rsplit("/", 1)[0] + "/status"
+    try:
+        with urllib.request.urlopen(http, timeout=5) as r:
+            return json.loads(r.read()).get("pico_rss_mb")
+    except Exception:
+        return None
+
+async def ejecutar(url: str, clients: int, requests: int,
+                   replay: Optional[List[Any]] = None) -> Dict[str, Any]:
+    lat, errores = [], []
+    t0 = time.perf_counter()
+    await asyncio.gather(*[
+        cliente(url, requests, lat, errores, seed=i, replay=replay) for i in range(clients)
+    ])
+    total = time.perf_counter() - t0
+    return {
+        "clients": clients,
+        **resumen(lat, total),
+        "errors": len(errores),
+        "server_peak_rss_mb": rss_servidor(url),
+        "client_rss_mb": rss_mb(),
+    }
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="ws://127.0.0.1:8000/mcp")
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--requests", type=int, default=20, help="mensajes por cliente")
+    ap.add_argument("--replay", help="archivo JSONL con los mensajes a reproducir")
+    a = ap.parse_args()
+
+    replay = leer_replay(a.replay) if a.replay else None
+    print(json.dumps(await ejecutar(a.url, a.clients, a.requests, replay), indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
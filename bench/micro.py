@@ -0,0 +1,82 @@
+# bench/micro.py
+# Micro-benchmarks en proceso de Inventario.buscar_tiendas_en_zona,
+# recomendar_complementos (y sus versiones bulk) y normalize_text sobre un
+# CSV dado (o uno sintético de --filas), con throughput, p50/p95/p99 y RSS
+# en JSON.
+#
+#   python bench/micro.py --filas 100000 [--iter 2000]
+#   python bench/micro.py --csv inventario.csv --catalogo complementos.csv
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from comun import resumen, rss_mb  # noqa: E402
+from sinteticos import PRODUCTOS, generar_catalogo, generar_filas  # noqa: E402
+
+def medir(fn: Callable[[Any], Any], entradas: List[Any], n: int) -> Dict[str, float]:
+    lat = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        x = entradas[i % len(entradas)]
+        t = time.perf_counter()
+        fn(x)
+        lat.append(time.perf_counter() - t)
+    return resumen(lat, time.perf_counter() - t0)
+
+def correr(csv: Path, catalogo: Path, n: int, seed: int = 0) -> Dict[str, Any]:
+    rss0 = rss_mb()
+    t0 = time.perf_counter()
+    import inventario  # pandas se importa aquí y entra en la carga
+    inv = inventario.Inventario(str(csv), str(catalogo), recarga_seg=0)
+    carga = time.perf_counter() - t0
+
+    rnd = random.Random(seed)
+    zonas = [str(z) for z in range(0, 27)]
+    productos = [p.lower().split(" (")[0] for p in PRODUCTOS] + ["bionik bal", "xyz"]
+    textos = [f"{rnd.choice(PRODUCTOS)} {rnd.randint(0, 10 ** 6)}" for _ in range(5000)]
+    consultas = [(p, rnd.choice([None] + zonas)) for p in productos for _ in range(4)]
+
+    out = {
+        "filas": inv.estado()["filas"],
+        "carga_seg": round(carga, 3),
+        "rss_base_mb": rss0,
+        "rss_cargado_mb": rss_mb(),
+        "buscar_tiendas_en_zona": medir(inv.buscar_tiendas_en_zona, zonas, n),
+        "buscar_tiendas_en_zona_json": medir(inv.buscar_tiendas_en_zona_json, zonas, n),
+        "recomendar_complementos": medir(lambda q: inv.recomendar_complementos(*q), consultas, n),
+        # una llamada con todas las zonas / todos los productos de una zona
+        "buscar_tiendas_en_zonas": medir(inv.buscar_tiendas_en_zonas, [zonas], max(1, n // len(zonas))),
+        "recomendar_complementos_bulk": medir(lambda z: inv.recomendar_complementos_bulk(productos, z),
+                                              [None] + zonas, max(1, n // len(productos))),
+        # textos casi todos distintos: mide la normalización y no la LRU
+        "normalize_text": medir(inventario.normalize_text, textos, max(n, len(textos))),
+    }
+    out["rss_final_mb"] = rss_mb()
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv")
+    ap.add_argument("--catalogo")
+    ap.add_argument("--filas", type=float, default=1e4, help="sin --csv: filas del inventario sintético")
+    ap.add_argument("--iter", type=int, default=2000, help="llamadas por función")
+    a = ap.parse_args()
+
+    if a.csv:
+        print(json.dumps(correr(Path(a.csv), Path(a.catalogo or "complementos_catalogo.csv"), a.iter), indent=2))
+        return
+    with tempfile.TemporaryDirectory() as d:
+        csv, cat = Path(d) / "inventario.csv", Path(d) / "complementos.csv"
+        generar_filas(csv, int(a.filas))
+        generar_catalogo(cat, 2000)
+        print(json.dumps(correr(csv, cat, a.iter), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# bench/perfil_import.py
+# Perfil de arranque de mcp_server: tiempo de import (python -X importtime,
+# módulos más caros) y, con --servir, segundos hasta que /healthz y /readyz
+# responden 200 con uvicorn, para cada modo de MCP_CARGA.
+#
+#   python bench/perfil_import.py [--modos import,startup] [--top 10] [--servir]
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+def perfil_import(modo: str, top: int) -> dict:
+    env = {**os.environ, "MCP_CARGA": modo, "INVENTARIO_RECARGA_SEG": "0"}
+    t0 = time.perf_counter()
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", "import mcp_server"],
+                       cwd=RAIZ, env=env, capture_output=True, text=True, check=True)
+    total = time.perf_counter() - t0
+    # formato: "import time: self [us] | cumulative | imported package"
+    filas = []
+    for linea in r.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, self_us, cum_us, nombre = linea.replace("import time:", "|").split("|")
+        nombre = nombre[1:].rstrip()
+        prof = (len(nombre) - len(nombre.lstrip())) // 2
+        filas.append((nombre.strip(), prof, int(cum_us)))
+    # imports directos de mcp_server (profundidad 1) y los del intérprete (0)
+    raiz = [f for f in filas if f[1] <= 1 and f[0] != "mcp_server"]
+    raiz.sort(key=lambda f: -f[2])
+    nombres = {f[0] for f in filas}
+    return {
+        "proceso_seg": round(total, 3),
+        "import_mcp_server_ms": round(next((f[2] for f in filas if f[0] == "mcp_server"), 0) / 1000, 1),
+        "pandas_importado": "pandas" in nombres,
+        "top_ms": {f[0]: round(f[2] / 1000, 1) for f in raiz[:top]},
+    }
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _esperar(url: str, t0: float, limite: float) -> float:
+    while time.perf_counter() - t0 < limite:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return round(time.perf_counter() - t0, 3)
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    return float("nan")
+
+def perfil_servir(modo: str, limite: float = 120.0) -> dict:
+    puerto = _puerto_libre()
+    env = {**os.environ, "MCP_CARGA": modo, "INVENTARIO_RECARGA_SEG": "0"}
+    t0 = time.perf_counter()
+    p = subprocess.Popen([sys.executable, "-m", "uvicorn", "mcp_server:app", "--port", str(puerto)],
+                         cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        vivo = _esperar(f"http://127.0.0.1:{puerto}/healthz", t0, limite)
+        listo = _esperar(f"http://127.0.0.1:{puerto}/readyz", t0, limite)
+    finally:
+        p.terminate()
+        p.wait()
+    return {"healthz_seg": vivo, "readyz_seg": listo}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--modos", default="import,startup,lazy")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--servir", action="store_true", help="arranca uvicorn y mide /healthz y /readyz")
+    a = ap.parse_args()
+
+    out = {}
+    for modo in a.modos.split(","):
+        out[modo] = perfil_import(modo, a.top)
+        if a.servir and modo != "lazy":
+            out[modo].update(perfil_servir(modo))
+    print(json.dumps(out, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# bench/sinteticos.py
+# Inventarios y catálogos de complementos sintéticos de tamaño configurable
+# (10^3 a 10^6 filas), con el mismo esquema que prueba.csv más Producto,
+# Stock y Codigo, para los benchmarks.
+#
+#   python bench/sinteticos.py --filas 100000 --catalogo 2000 --dir /tmp/datos
+import argparse
+import csv
+import json
+import random
+from pathlib import Path
+
+CIUDADES = ["Guatemala", "Mixco", "Villa Nueva", "San Cristóbal", "Santa Catarina Pinula",
+            "Fraijanes", "San José Pinula", "Chinautla"]
+PRODUCTOS = ["ARENA L-FAVOURITE CAFÉ", "ARENA MISH LIMÓN", "BIONIC TOSS-N-TUG",
+             "BIONIC BALL SMALL", "K-NINO ADULTO (20kg)", "BIO STONES MANZANA (8kg)"]
+TIPOS = ["upsell", "cross-sell"]
+
+def _productos(rnd: random.Random, n: int) -> list:
+    return [(f"{rnd.choice(PRODUCTOS)} {i}", f"P-{i:05d}") for i in range(n)]
+
+def _tienda(rnd: random.Random, t: int) -> tuple:
+    return (f"Tienda {t}", f"{rnd.randint(1, 30)} Calle {rnd.randint(1, 40)}-{rnd.randint(1, 99)}",
+            rnd.choice(CIUDADES), str(rnd.randint(1, 25)))
+
+def generar(path: Path, stores: int, products: int, seed: int = 0):
+    """Tiendas x productos: cada tienda tiene entre 1 y `products` productos."""
+    rnd = random.Random(seed)
+    prods = _productos(rnd, products)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Nombre", "Calle", "Ciudad", "Zona", "Producto", "Stock", "Codigo"])
+        for t in range(stores):
+            tienda = _tienda(rnd, t)
+            for nombre, codigo in rnd.sample(prods, k=min(products, rnd.randint(1, products))):
+                w.writerow([*tienda, nombre, str(rnd.randint(0, 500)), codigo])
+
+def generar_filas(path: Path, filas: int, products: int = 200, seed: int = 0):
+    """Exactamente `filas` filas; cada tienda lleva un lote de hasta 50 productos."""
+    rnd = random.Random(seed)
+    prods = _productos(rnd, products)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Nombre", "Calle", "Ciudad", "Zona", "Producto", "Stock", "Codigo"])
+        t = escritas = 0
+        while escritas < filas:
+            tienda = _tienda(rnd, t)
+            t += 1
+            k = min(filas - escritas, rnd.randint(1, min(50, products)))
+            for nombre, codigo in rnd.sample(prods, k=k):
+                w.writerow([*tienda, nombre, str(rnd.randint(0, 500)), codigo])
+            escritas += k
+
+def generar_catalogo(path: Path, filas: int, products: int = 200, seed: int = 0):
+    """Catálogo base -> complemento sobre los mismos productos que generar_filas."""
+    rnd = random.Random(seed)
+    prods = _productos(rnd, products)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["base_nombre", "base_codigo", "complemento_nombre", "complemento_codigo", "tipo", "razon"])
+        for _ in range(filas):
+            (bn, bc), (cn, cc) = rnd.sample(prods, k=2)
+            w.writerow([bn, bc, cn, cc, rnd.choice(TIPOS), "Sugerencia sintética"])
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--filas", type=float, default=1e5, help="filas del inventario (acepta 1e6)")
+    ap.add_argument("--catalogo", type=float, default=2000, help="filas del catálogo de complementos")
+    ap.add_argument("--productos", type=int, default=200)
+    ap.add_argument("--dir", default=".")
+    ap.add_argument("--seed", type=int, default=0)
+    a = ap.parse_args()
+
+    d = Path(a.dir)
+    d.mkdir(parents=True, exist_ok=True)
+    inv, cat = d / "inventario.csv", d / "complementos.csv"
+    generar_filas(inv, int(a.filas), a.productos, a.seed)
+    generar_catalogo(cat, int(a.catalogo), a.productos, a.seed)
+    print(json.dumps({"inventario": str(inv), "complementos": str(cat),
+                      "filas": int(a.filas), "catalogo": int(a.catalogo)}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bench/suite.py
+# Suite de regresión de rendimiento: para cada tamaño genera un inventario y
+# catálogo sintéticos, corre los micro-benchmarks en un proceso limpio y,
+# con --ws, levanta el servidor MCP sobre esos datos y le reproduce tráfico
+# JSON-RPC con muchos clientes WebSocket. Todo sale en un único JSON.
+#
+#   python bench/suite.py --filas 1e3,1e4,1e5 --ws --replay bench/replay_ejemplo.jsonl --out resultados.json
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import load_ws
+from sinteticos import generar_catalogo, generar_filas
+
+BENCH = Path(__file__).resolve().parent
+RAIZ = BENCH.parent
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def micro(csv: Path, cat: Path, iteraciones: int) -> dict:
+    r = subprocess.run([sys.executable, str(BENCH / "micro.py"), "--csv", str(csv),
+                        "--catalogo", str(cat), "--iter", str(iteraciones)],
+                       capture_output=True, text=True, check=True)
+    return json.loads(r.stdout)
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _esperar_listo(puerto: int, limite: float = 600.0) -> float:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < limite:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/readyz", timeout=1) as r:
+                if r.status == 200:
+                    return time.perf_counter() - t0
+        except Exception:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError("el servidor MCP no quedó listo")
+
+def carga_ws(csv: Path, cat: Path, clients: int, requests: int, replay) -> dict:
+    puerto = _puerto_libre()
+    env = {**os.environ, "INVENTARIO_CSV": str(csv), "COMPLEMENTOS_CSV": str(cat),
+           "INVENTARIO_RECARGA_SEG": "0"}
+    p = subprocess.Popen([sys.executable, "-m", "uvicorn", "mcp_server:app", "--port", str(puerto)],
+                         cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        listo = _esperar_listo(puerto)
+        res = asyncio.run(load_ws.ejecutar(f"ws://127.0.0.1:{puerto}/mcp", clients, requests, replay))
+        res["ready_seg"] = round(listo, 3)
+        return res
+    finally:
+        p.terminate()
+        p.wait()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--filas", default="1e3,1e4,1e5", help="tamaños del inventario, separados por coma")
+    ap.add_argument("--catalogo", type=float, default=2000)
+    ap.add_argument("--iter", type=int, default=2000, help="llamadas por micro-benchmark")
+    ap.add_argument("--ws", action="store_true", help="incluye la prueba de carga WebSocket")
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--requests", type=int, default=20)
+    ap.add_argument("--replay", help="JSONL a reproducir (por defecto, la mezcla de load_ws)")
+    ap.add_argument("--out", help="además de imprimirlo, guarda el JSON aquí")
+    a = ap.parse_args()
+
+    replay = load_ws.leer_replay(a.replay) if a.replay else None
+    out = {
+        "meta": {"commit": _commit(), "python": platform.python_version(),
+                 "cpus": os.cpu_count(), "fecha": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "resultados": {},
+    }
+    for tam in a.filas.split(","):
+        filas = int(float(tam))
+        with tempfile.TemporaryDirectory() as d:
+            csv, cat = Path(d) / "inventario.csv", Path(d) / "complementos.csv"
+            generar_filas(csv, filas)
+            generar_catalogo(cat, int(a.catalogo))
+            res = {"micro": micro(csv, cat, a.iter)}
+            if a.ws:
+                res["ws"] = carga_ws(csv, cat, a.clients, a.requests, replay)
+        out["resultados"][str(filas)] = res
+        print(f"# {filas} filas listo", file=sys.stderr)
+
+    texto = json.dumps(out, indent=2)
+    if a.out:
+        Path(a.out).write_text(texto, encoding="utf-8")
+    print(texto)
+
+if __name__ == "__main__":
+    main()
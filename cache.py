@@ -0,0 +1,61 @@
+# cache.py
+# Cache LRU con TTL y contadores, para resultados de herramientas.
+# No es thread-safe: se usa solo desde el event loop.
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_FALTA = object()
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key, _FALTA)
+        if item is _FALTA:
+            self.misses += 1
+            return default
+        valor, vence = item
+        if vence is not None and vence < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return valor
+
+    def put(self, key: Hashable, valor: Any):
+        if self.maxsize <= 0:
+            return
+        vence = time.monotonic() + self.ttl if self.ttl else None
+        self._data[key] = (valor, vence)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
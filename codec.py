@@ -0,0 +1,37 @@
+# codec.py
+# Serialización JSON del servidor: orjson si está instalado (bytes UTF-8,
+# varias veces más rápido), si no la librería estándar con la misma salida
+# compacta.
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+class RawJSON(str):
+    """
+    Fragmento JSON ya serializado (p. ej. el resultado cacheado de una zona).
+    encode_response lo inserta tal cual en el sobre JSON-RPC sin volver a
+    serializarlo.
+    """
+
+def dumps(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def loads(raw: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def encode_response(resp: Any) -> str:
+    """Serializa una respuesta (o batch) respetando los resultados RawJSON."""
+    if isinstance(resp, list):
+        return "[" + ",".join(encode_response(r) for r in resp) + "]"
+    if isinstance(resp, dict) and isinstance(resp.get("result"), RawJSON):
+        head = {k: v for k, v in resp.items() if k != "result"}
+        return dumps(head)[:-1] + ',"result":' + resp["result"] + "}"
+    return dumps(resp)
@@ -0,0 +1,41 @@
+# gunicorn.conf.py
+# Varios workers uvicorn (uno por núcleo) sin multiplicar la memoria del
+# inventario:
+#   - preload_app: el master carga el inventario una vez (desde el snapshot
+#     mapeado con mmap) y los workers lo heredan por fork, copy-on-write.
+#   - gc.freeze() y malloc_trim antes del fork: el GC no recorre los objetos
+#     heredados y las asignaciones de cada worker no caen en heap libre
+#     heredado, así que sus páginas no se copian en cada worker.
+#   - cada worker recarga por su cuenta, pero solo uno parsea el CSV nuevo
+#     (lock sobre <csv>.snap.lock); los demás mapean el snapshot que dejó.
+#
+#   gunicorn -c gunicorn.conf.py mcp_server:app
+import gc
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+
+# el inventario se carga al importar la app (en el master, antes del fork);
+# los núcleos ya los reparten los workers, así que pocos hilos por worker
+os.environ.setdefault("MCP_CARGA", "import")
+os.environ.setdefault("MCP_WORKERS", "2")
+
+def when_ready(server):
+    # antes de crear los workers: sin hilo de recarga en el master (fork con
+    # hilos no es seguro) y objetos heredados fuera del GC
+    app = sys.modules.get("mcp_server")
+    if app is not None and app._inv is not None:
+        app._inv.detener_recarga()
+        sys.modules["inventario"].liberar_memoria()
+    gc.freeze()
+
+def post_fork(server, worker):
+    app = sys.modules.get("mcp_server")
+    if app is not None:
+        app._init_worker()
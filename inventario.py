@@ -1,10 +1,83 @@
 # inventario.py
+import numpy as np
 import pandas as pd
 import re
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from pandas.api.types import union_categoricals
+
+import codec
+import metricas
+import snapshot
 import unicodedata
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional
 import os
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", "8192"))
+
+_RE_JUGUETES = re.compile(r"\b(juguetes)\b")
+
+# Representación compacta del inventario: columnas repetitivas como
+# categóricas (un código entero por fila + valores internados) y Stock numérico
+COMPACTO = os.getenv("INVENTARIO_COMPACTO", "1") != "0"
+COLUMNAS_REGISTRO = ['Nombre','Calle','Ciudad','Zona','Producto','Stock','Codigo']
+
+# Snapshot binario del inventario parseado junto al CSV ("<csv>.snap"); se
+# invalida si cambia el CSV (tamaño/mtime, y hash si solo cambió el mtime)
+SNAPSHOT = os.getenv("INVENTARIO_SNAPSHOT", "1") != "0"
+SNAPSHOT_FORMATO = 2
+# Otro directorio para el snapshot y su lock (si el del CSV es de solo lectura)
+SNAPSHOT_DIR = os.getenv("INVENTARIO_SNAPSHOT_DIR", "")
+
+# Duración de cada etapa de recomendar_complementos
+_ETAPAS = metricas.histograma(
+    "inventario_recomendar_etapa_seconds",
+    "Duracion de cada etapa de recomendar_complementos.",
+    ["etapa"],
+)
+
+# Carga por trozos: el CSV se parsea, normaliza y compacta de a N filas, así
+# el pico de memoria es el inventario compacto más un trozo (0 = de una vez).
+# Con INVENTARIO_CARGA_PROCESOS > 0 los trozos se normalizan en paralelo.
+TROZO_FILAS = int(os.getenv("INVENTARIO_TROZO_FILAS", "100000"))
+CARGA_PROCESOS = int(os.getenv("INVENTARIO_CARGA_PROCESOS", "0"))
+
+class _TablaSignos(dict):
+    """
+    Tabla para str.translate: conserva [a-z0-9.] y los espacios, el resto
+    (guiones, barras, signos, letras no ASCII) pasa a espacio. Cada carácter
+    se clasifica la primera vez que aparece.
+    """
+    def __missing__(self, o: int) -> str:
+        c = chr(o)
+        keep = ("a" <= c <= "z") or ("0" <= c <= "9") or c == "." or c.isspace()
+        self[o] = c if keep else " "
+        return self[o]
+
+_SIGNOS = _TablaSignos()
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize(s: str) -> str:
+    # a minúsculas
+    s = s.lower()
+    # quita acentos (solo hace falta si hay caracteres no ASCII)
+    if not s.isascii():
+        s = "".join(
+            c for c in unicodedata.normalize("NFD", s)
+            if unicodedata.category(c) != "Mn"
+        )
+    # guiones, barras y signos -> espacio, en una sola pasada
+    s = s.translate(_SIGNOS)
+    # plural simple
+    if "juguetes" in s:
+        s = _RE_JUGUETES.sub("juguete", s)
+    # colapsa espacios
+    return " ".join(s.split())
 
 def normalize_text(s: str) -> str:
     """
@@ -13,22 +86,7 @@ def normalize_text(s: str) -> str:
     """
     if not s:
         return ""
-    # a minúsculas
-    s = s.lower()
-    # quita acentos
-    s = "".join(
-        c for c in unicodedata.normalize("NFD", s)
-        if unicodedata.category(c) != "Mn"
-    )
-    # reemplaza guiones y barras por espacio
-    s = re.sub(r"[-_/]", " ", s)
-    # quita signos
-    s = re.sub(r"[^a-z0-9\s\.]", " ", s)
-    # plural simple
-    s = re.sub(r"\b(juguetes)\b", "juguete", s)
-    # colapsa espacios
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return _normalize(s)
 
 def tokenize(s: str) -> list:
     s = normalize_text(s)
@@ -47,21 +105,396 @@ ALIAS_MAP = {
     "biostones": "bio stones",
 }
 
+def _trigramas(w: str) -> set:
+    return {w[i:i + 3] for i in range(len(w) - 2)}
+
+_VACIO = np.empty(0, dtype=np.int32)
+
+def _union(arreglos: List[np.ndarray]) -> np.ndarray:
+    if not arreglos:
+        return _VACIO
+    if len(arreglos) == 1:
+        return arreglos[0]
+    return np.unique(np.concatenate(arreglos))
+
+class IndiceTokens:
+    """
+    Índice invertido palabra -> filas sobre una columna ya normalizada.
+
+    Conserva la semántica de subcadena del matching original: un token de
+    consulta casa con una fila si aparece dentro de alguna de sus palabras
+    (los textos normalizados no tienen espacios repetidos, así que un token
+    sin espacios nunca cruza de una palabra a otra). Las filas de cada
+    palabra son arreglos numpy ordenados y no sets de ints: en el snapshot
+    viajan fuera de banda y los workers los comparten vía mmap.
+    """
+    MAX_CACHE = 4096
+
+    def __init__(self, textos: Iterable[str]):
+        filas: Dict[str, list] = {}
+        for i, s in enumerate(textos):
+            for w in set(s.split()):
+                filas.setdefault(w, []).append(i)
+        self._filas = {w: np.asarray(ids, dtype=np.int32) for w, ids in filas.items()}
+
+        # trigrama -> palabras del vocabulario, para no recorrer todo el
+        # vocabulario al buscar tokens que son subcadena de otras palabras
+        self._vocab_tri: Dict[str, set] = {}
+        for w in self._filas:
+            for g in _trigramas(w):
+                self._vocab_tri.setdefault(g, set()).add(w)
+        self._cache: Dict[str, np.ndarray] = {}
+
+    def __getstate__(self):
+        # la caché de consultas no viaja en el snapshot
+        return {**self.__dict__, "_cache": {}}
+
+    def _palabras(self, token: str) -> Iterable[str]:
+        if len(token) < 3:
+            return (w for w in self._filas if token in w)
+        grupos = sorted((self._vocab_tri.get(g, ()) for g in _trigramas(token)), key=len)
+        cands = set(grupos[0]).intersection(*grupos[1:])
+        return (w for w in cands if token in w)
+
+    def filas(self, token: str) -> np.ndarray:
+        """Filas (ordenadas) con alguna palabra que contiene `token`."""
+        hit = self._cache.get(token)
+        if hit is None:
+            hit = _union([self._filas[w] for w in self._palabras(token)])
+            if len(self._cache) >= self.MAX_CACHE:
+                self._cache.clear()
+            self._cache[token] = hit
+        return hit
+
+    def todas(self, tokens: Iterable[str]) -> np.ndarray:
+        """Filas que contienen todos los tokens (AND), ordenadas."""
+        grupos = sorted((self.filas(t) for t in tokens), key=len)
+        if not grupos:
+            return _VACIO
+        acc = grupos[0]
+        for g in grupos[1:]:
+            if not len(acc):
+                break
+            acc = np.intersect1d(acc, g, assume_unique=True)
+        return acc
+
+    def alguna(self, tokens: Iterable[str]) -> np.ndarray:
+        """Filas que contienen al menos un token (OR), ordenadas."""
+        return _union([self.filas(t) for t in tokens])
+
+def _trigramas_palabras(s: str) -> set:
+    # como pg_trgm: cada palabra con dos espacios delante y uno detrás
+    out = set()
+    for w in s.split():
+        out |= _trigramas(f"  {w} ")
+    return out
+
+class IndiceTrigramas:
+    """
+    Índice de trigramas de caracteres para búsqueda tolerante a errores
+    ("bionik bal" -> "bionic ball small"). La similitud es la de pg_trgm,
+    |A∩B| / |A∪B|, y solo se calcula sobre los textos que comparten algún
+    trigrama con la consulta, sin recorrer el catálogo completo.
+    """
+    UMBRAL = 0.3
+
+    def __init__(self, textos: Iterable[str], items: Iterable[Dict[str, Any]]):
+        self.textos = list(textos)
+        self.items = list(items)
+        post: Dict[str, list] = {}
+        tams = []
+        for i, t in enumerate(self.textos):
+            gs = _trigramas_palabras(t)
+            tams.append(len(gs))
+            for g in gs:
+                post.setdefault(g, []).append(i)
+        self._post = {g: np.asarray(ids, dtype=np.int64) for g, ids in post.items()}
+        self._tams = np.asarray(tams, dtype=np.int64)
+
+    def buscar(self, q_norm: str, k: int = 10, umbral: float = UMBRAL) -> List[tuple]:
+        """(posición, score) de los k textos más parecidos, de mayor a menor."""
+        gs = _trigramas_palabras(q_norm)
+        listas = [self._post[g] for g in gs if g in self._post]
+        if not listas or k <= 0:
+            return []
+        todos = np.concatenate(listas)
+        if len(todos) > len(self.textos) // 8:
+            # trigramas muy frecuentes: contar sobre un arreglo denso sale más barato
+            cuenta = np.bincount(todos, minlength=len(self.textos))
+            ids = np.flatnonzero(cuenta)
+            comunes = cuenta[ids]
+        else:
+            ids, comunes = np.unique(todos, return_counts=True)
+        scores = comunes / (len(gs) + self._tams[ids] - comunes)
+        keep = scores >= umbral
+        ids, scores = ids[keep], scores[keep]
+        if len(ids) > k:
+            top = np.argpartition(-scores, k)[:k]
+            ids, scores = ids[top], scores[top]
+        orden = np.lexsort((ids, -scores))
+        return [(int(ids[i]), float(scores[i])) for i in orden]
+
+def _indice_nombres(df: pd.DataFrame, col_norm: str, col_nombre: str, col_codigo: str) -> IndiceTrigramas:
+    uniq = df[df[col_norm] != ""].drop_duplicates(col_norm)
+    codigos = uniq[col_codigo] if col_codigo in uniq.columns else [""] * len(uniq)
+    items = [{"nombre": n, "codigo": c} for n, c in zip(uniq[col_nombre], codigos)]
+    return IndiceTrigramas(uniq[col_norm], items)
+
+def _registros_por_grupo(df: pd.DataFrame, grupos: List[np.ndarray],
+                         zona: "str | List[str] | None" = None) -> List[List[Dict[str, Any]]]:
+    """
+    Registros de varios grupos de posiciones con un solo iloc + to_dict, en
+    vez de uno por grupo. `zona` (una para todos o una por grupo) reemplaza
+    la columna 'Zona' por la normalizada, como filas_zona.
+    """
+    if not grupos:
+        return []
+    largos = [len(g) for g in grupos]
+    base = df.iloc[np.concatenate(grupos)]
+    if isinstance(zona, list):
+        base = base.assign(Zona=np.repeat(np.array(zona, dtype=object), largos))
+    elif zona is not None:
+        base = base.assign(Zona=zona)
+    cols = [c for c in COLUMNAS_REGISTRO if c in base.columns]
+    if not cols:
+        return [[] for _ in grupos]
+    registros = _a_registros(base[cols])
+    fin = np.cumsum(largos)
+    return [registros[f - n:f] for f, n in zip(fin, largos)]
+
+@dataclass(frozen=True)
+class _Datos:
+    """Inventario principal ya parseado e indexado; no se modifica tras crearse."""
+    df: pd.DataFrame
+    mtime: Optional[float]
+    zona_idx: Dict[str, np.ndarray]
+    idx_producto: Optional[IndiceTokens]
+    trigr_producto: Optional[IndiceTrigramas]
+    # resultado JSON ya serializado por zona; se llena bajo demanda y muere
+    # con el snapshot, así que nunca queda desactualizado
+    zona_json: Dict[str, str] = field(default_factory=dict)
+
+    def filas_producto(self, q_norm: str) -> Optional[np.ndarray]:
+        """
+        Posiciones (ordenadas) cuyo 'Producto_norm' contiene `q_norm`;
+        None significa todas las filas. Usa el índice de tokens para acotar
+        candidatas y solo verifica la subcadena completa sobre ellas.
+        """
+        df = self.df
+        if not q_norm:
+            return None
+        if '.' in q_norm or self.idx_producto is None:
+            # '.' es comodín en str.contains: se mantiene el escaneo original
+            mask = df['Producto_norm'].str.contains(q_norm, na=False)
+            return np.flatnonzero(mask.to_numpy())
+        cands = self.idx_producto.todas(q_norm.split())
+        if not len(cands):
+            return np.empty(0, dtype=np.intp)
+        pos = cands.astype(np.intp)
+        col = df['Producto_norm']
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            # se verifica cada producto distinto una vez y no cada fila
+            codes = col.cat.codes.to_numpy()[pos]
+            cats = col.cat.categories
+            ok = np.zeros(len(cats), dtype=bool)
+            unicos = np.unique(codes)
+            ok[unicos] = [q_norm in t for t in cats[unicos]]
+            return pos[ok[codes]]
+        textos = col.to_numpy()[pos]
+        return pos[[q_norm in t for t in textos]]
+
+    def filas_zona(self, zona: str, inicio: int = 0, fin: Optional[int] = None):
+        """
+        Filas de la zona vía índice, con 'Zona' ya normalizada (solo dígitos);
+        `inicio`/`fin` recortan las posiciones antes de tocar el DataFrame.
+        """
+        pos = self.zona_idx.get(zona)
+        if pos is None:
+            return self.df.iloc[0:0]
+        return self.df.iloc[pos[inicio:fin]].assign(Zona=zona)
+
+    def marca(self) -> str:
+        """Identifica estos datos en los cursores; igual en todos los workers."""
+        return format(int((self.mtime or 0) * 1e6), "x")
+
+def _entero_canonico(x: Any) -> bool:
+    """
+    True si `x` vuelve idéntico con str(int(x)) y cabe en int64: solo dígitos
+    ASCII ("²" pasa isdigit pero no int()) y como mucho 18.
+    """
+    return isinstance(x, str) and x.isascii() and x.isdigit() and len(x) <= 18 and x == str(int(x))
+
+def _compactar(df: pd.DataFrame, max_ratio: float = 0.5) -> pd.DataFrame:
+    """
+    Columnas de texto con muchos valores repetidos (zonas, ciudades, tiendas,
+    productos y sus *_norm) pasan a categóricas; Stock pasa a entero solo si
+    cada valor es un _entero_canonico (si no, queda como texto). Los registros se rearman con
+    _a_registros, así que la salida pública no cambia. Acepta columnas ya
+    categóricas (carga por trozos) y deshace las que no convenían.
+    """
+    n = len(df)
+    if not n:
+        return df
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            cats = s.cat.categories
+            if col == 'Stock' and not s.hasnans and all(_entero_canonico(x) for x in cats):
+                vals = np.array([int(x) for x in cats], dtype=np.int64)
+                dt = np.int32 if not len(vals) or vals.max() <= np.iinfo(np.int32).max else np.int64
+                df[col] = pd.Series(vals.astype(dt)[s.cat.codes.to_numpy()], index=s.index)
+            elif len(cats) > n * max_ratio:
+                df[col] = s.astype(cats.dtype)
+            continue
+        if not pd.api.types.is_string_dtype(s.dtype):
+            continue
+        if col == 'Stock':
+            v = s.to_numpy()
+            if all(_entero_canonico(x) for x in v):
+                num = pd.to_numeric(s)
+                if num.max() <= np.iinfo(np.int32).max:
+                    num = num.astype(np.int32)
+                df[col] = num
+            continue
+        if s.nunique() <= n * max_ratio:
+            df[col] = s.astype('category')
+    return df
+
+def _leer_csv(path: Path, columnas: List[str], trozo: Optional[int] = None) -> Iterable[pd.DataFrame]:
+    """
+    El CSV como DataFrames de texto ya limpios (cabeceras sin comillas,
+    columnas conocidas sin NaN ni espacios); de a `trozo` filas o entero.
+    """
+    lector = pd.read_csv(
+        path,
+        quotechar='"',
+        encoding='utf-8',
+        on_bad_lines='skip',
+        dtype=str,
+        chunksize=trozo or None,
+    )
+    for df in (lector if trozo else [lector]):
+        df.columns = df.columns.str.replace('"', '').str.strip()
+        for col in columnas:
+            if col in df.columns:
+                df[col] = df[col].fillna("").astype(str).str.strip()
+        yield df
+
+def _preparar_trozo(df: pd.DataFrame, categorizar: bool) -> tuple:
+    """
+    Normaliza un trozo del inventario: columnas *_norm, posiciones locales
+    por zona y, si `categorizar`, todo el texto como categórico para que el
+    trozo ocupe poco hasta unirlo. Es una función de módulo para poder
+    ejecutarse en un proceso aparte.
+    """
+    if 'Producto' in df.columns:
+        df['Producto_norm'] = df['Producto'].map(normalize_text)
+    if 'Codigo' in df.columns:
+        df['Codigo_norm'] = df['Codigo'].str.lower().str.strip()
+    zonas = {}
+    if 'Zona' in df.columns:
+        zona_norm = df['Zona'].str.extract(r'(\d+)')[0]
+        zonas = dict(zona_norm.groupby(zona_norm, sort=False).indices)
+    if categorizar:
+        for col in df.columns:
+            if pd.api.types.is_string_dtype(df[col].dtype):
+                df[col] = df[col].astype('category')
+    return df, zonas
+
+def _unir_trozos(trozos: List[pd.DataFrame]) -> pd.DataFrame:
+    if len(trozos) == 1:
+        return trozos[0].reset_index(drop=True)
+    cols = {}
+    for col in trozos[0].columns:
+        partes = [t[col] for t in trozos]
+        if all(isinstance(p.dtype, pd.CategoricalDtype) for p in partes):
+            try:
+                cols[col] = union_categoricals(partes)
+            except TypeError:
+                # categorías de distinto tipo (p. ej. una columna vacía en un trozo)
+                cols[col] = pd.concat([p.astype(object) for p in partes], ignore_index=True)
+        else:
+            cols[col] = pd.concat(partes, ignore_index=True)
+        for t in trozos:
+            del t[col]  # libera el trozo a medida que se une
+    return pd.DataFrame(cols)
+
+def _pico_rss_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso (Linux: ru_maxrss en KiB)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def liberar_memoria():
+    """
+    Devuelve al sistema el heap libre que dejó un parseo (glibc malloc_trim).
+    Con workers creados por fork importa: si no, las asignaciones nuevas de
+    cada worker caen en páginas heredadas y las copian (copy-on-write).
+    """
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def _a_registros(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """to_dict(records) devolviendo siempre str, como el CSV leído con dtype=str."""
+    if 'Stock' in df.columns and pd.api.types.is_integer_dtype(df['Stock'].dtype):
+        df = df.astype({'Stock': str})
+    return df.to_dict(orient='records')
+
+@dataclass(frozen=True)
+class _Catalogo:
+    """Catálogo de complementos ya parseado e indexado (df None si no hay archivo)."""
+    df: Optional[pd.DataFrame]
+    mtime: Optional[float]
+    idx: Optional[IndiceTokens]
+    codigo_idx: Dict[str, np.ndarray]
+    trigr: Optional[IndiceTrigramas]
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """
+    Inventario + catálogo publicados juntos. Las consultas toman una
+    referencia al inicio y trabajan solo con ella, así que nunca ven una
+    recarga a medias.
+    """
+    datos: _Datos
+    catalogo: _Catalogo
+    version: int
+    creado: float
+
+def _mtime_de(path: Path) -> Optional[float]:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
 class Inventario:
-    def __init__(self, csv_path: str, complementos_csv: Optional[str] = None):
+    def __init__(self, csv_path: str, complementos_csv: Optional[str] = None,
+                 recarga_seg: Optional[float] = None):
         self.csv_path = Path(csv_path)
         self.complementos_path = Path(
             complementos_csv or os.getenv("COMPLEMENTOS_CSV", "complementos_catalogo.csv")
         )
 
-        self._df = None
-        self._mtime = None
-
-        self._df_compl = None
-        self._mtime_compl = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._stats = {
+            "recargas": 0,
+            "errores_recarga": 0,
+            "ultima_recarga_seg": 0.0,
+            "ultimo_error": None,
+            "origen_datos": None,
+            "filas_por_seg": None,
+        }
 
-        self._load()
-        self._load_complementos()
+        t0 = time.perf_counter()
+        self._snap = _Snapshot(self._load(), self._load_complementos(), 1, time.time())
+        self._stats["ultima_recarga_seg"] = time.perf_counter() - t0
 
         # reglas fallback
         self._rules = [
@@ -86,59 +519,144 @@ class Inventario:
             ]),
         ]
 
+        # recarga en segundo plano (0 = desactivada; usar recargar() a mano)
+        if recarga_seg is None:
+            recarga_seg = float(os.getenv("INVENTARIO_RECARGA_SEG", "2"))
+        self._recarga_seg = recarga_seg
+        if recarga_seg > 0:
+            self.iniciar_recarga(recarga_seg)
+
     # -------------------------
     # Carga de datos principales
     # -------------------------
-    def _load(self):
-        df = pd.read_csv(
-            self.csv_path,
-            quotechar='"',
-            encoding='utf-8',
-            on_bad_lines='skip',
-            dtype=str
-        )
-        df.columns = df.columns.str.replace('"', '').str.strip()
-        for col in ['Nombre','Calle','Ciudad','Zona','Producto','Stock','Codigo']:
-            if col in df.columns:
-                df[col] = df[col].fillna("").astype(str).str.strip()
+    def _load(self) -> _Datos:
+        if not SNAPSHOT:
+            self._stats["origen_datos"] = "csv"
+            return self._load_csv()
+        snap_path = self._ruta_snapshot()
+        datos = self._desde_snapshot(snap_path)
+        if datos is not None:
+            return datos
+
+        # con varios workers solo uno parsea el CSV; el resto espera el lock
+        # y mapea el snapshot que dejó (la recarga queda coordinada)
+        with snapshot.bloqueo(snap_path) as bloqueado:
+            if not bloqueado:
+                # no se puede escribir junto al CSV: se sigue sin snapshot
+                self._stats["origen_datos"] = "csv"
+                return self._load_csv()
+            datos = self._desde_snapshot(snap_path)
+            if datos is not None:
+                return datos
+
+            self._stats["origen_datos"] = "csv"
+            st = self.csv_path.stat()
+            clave = self._clave_snapshot(st, snapshot.sha256_archivo(self.csv_path))
+            datos = self._load_csv()
+            try:
+                snapshot.guardar(snap_path, (datos.df, datos.zona_idx, datos.idx_producto,
+                                             datos.trigr_producto), clave)
+            except Exception:
+                return datos  # p. ej. directorio de solo lectura: se sigue sin snapshot
+        # se usa la copia mapeada y no la recién parseada, para que también
+        # este proceso comparta las páginas con los demás workers
+        mapeado = snapshot.cargar(snap_path, lambda c: c == clave)
+        if mapeado is None:
+            return datos
+        return _Datos(mapeado[0], datos.mtime, *mapeado[1:])
+
+    def _ruta_snapshot(self) -> Path:
+        if SNAPSHOT_DIR:
+            return Path(SNAPSHOT_DIR) / f"{self.csv_path.name}.snap"
+        return Path(f"{self.csv_path}.snap")
+
+    def _desde_snapshot(self, snap_path: Path) -> Optional[_Datos]:
+        st = self.csv_path.stat()
+        datos = snapshot.cargar(snap_path, lambda clave: self._snapshot_vigente(clave, st))
+        if datos is None:
+            return None
+        self._stats["origen_datos"] = "snapshot"
+        return _Datos(datos[0], st.st_mtime, *datos[1:])
+
+    @staticmethod
+    def _clave_snapshot(st: os.stat_result, sha: str) -> Dict[str, Any]:
+        return {
+            "formato": SNAPSHOT_FORMATO, "pandas": pd.__version__, "numpy": np.__version__,
+            "compacto": COMPACTO, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha,
+        }
 
+    def _snapshot_vigente(self, clave: Dict[str, Any], st: os.stat_result) -> bool:
+        esperada = self._clave_snapshot(st, clave.get("sha256"))
+        if {k: v for k, v in clave.items() if k != "mtime_ns"} != \
+                {k: v for k, v in esperada.items() if k != "mtime_ns"}:
+            return False
+        if clave.get("mtime_ns") == st.st_mtime_ns:
+            return True
+        # mismo tamaño pero otro mtime (copia, touch): decide el contenido
+        return snapshot.sha256_archivo(self.csv_path) == clave.get("sha256")
+
+    def _load_csv(self) -> _Datos:
+        mtime = self.csv_path.stat().st_mtime
+        t0 = time.perf_counter()
+        trozos, zona_idx = [], {}
+        filas = 0
+        for df, zonas in self._trozos_preparados():
+            # posiciones locales del trozo -> globales
+            for z, pos in zonas.items():
+                zona_idx.setdefault(z, []).append(pos + filas)
+            filas += len(df)
+            trozos.append(df)
+        df = _unir_trozos(trozos)
+        del trozos
+        # zona normalizada (solo dígitos) e índice zona -> posiciones de fila,
+        # calculados una vez por carga y no en cada consulta
+        zona_idx = {z: p[0] if len(p) == 1 else np.concatenate(p) for z, p in zona_idx.items()}
+
+        idx_producto = None
+        trigr_producto = None
         if 'Producto' in df.columns:
-            df['Producto_norm'] = df['Producto'].map(normalize_text)
-        if 'Codigo' in df.columns:
-            df['Codigo_norm'] = df['Codigo'].str.lower().str.strip()
+            idx_producto = IndiceTokens(df['Producto_norm'])
+            trigr_producto = _indice_nombres(df, 'Producto_norm', 'Producto', 'Codigo')
 
-        self._df = df
-        self._mtime = self.csv_path.stat().st_mtime
+        if COMPACTO:
+            df = _compactar(df)
+        dt = time.perf_counter() - t0
+        self._stats["filas_por_seg"] = round(len(df) / dt) if dt > 0 else None
+        return _Datos(df, mtime, zona_idx, idx_producto, trigr_producto)
 
-    def _hot_reload(self):
-        m = self.csv_path.stat().st_mtime
-        if self._mtime != m:
-            self._load()
+    def _trozos_preparados(self) -> Iterable[tuple]:
+        """(trozo, zonas) en orden; en un pool de procesos si se configuró."""
+        lector = _leer_csv(self.csv_path, COLUMNAS_REGISTRO, TROZO_FILAS)
+        categorizar = COMPACTO and TROZO_FILAS > 0
+        if CARGA_PROCESOS <= 0 or TROZO_FILAS <= 0:
+            for df in lector:
+                yield _preparar_trozo(df, categorizar)
+            return
+        # ventana acotada de trozos en vuelo para no leer todo el CSV de golpe;
+        # "spawn" porque la recarga corre en un hilo y fork con hilos no es seguro
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=CARGA_PROCESOS, mp_context=ctx) as ex:
+            en_vuelo = []
+            for df in lector:
+                en_vuelo.append(ex.submit(_preparar_trozo, df, categorizar))
+                if len(en_vuelo) >= 2 * CARGA_PROCESOS:
+                    yield en_vuelo.pop(0).result()
+            for fut in en_vuelo:
+                yield fut.result()
 
     # ----------------------------------
     # Carga de catálogo de complementos
     # ----------------------------------
-    def _load_complementos(self):
-        if not self.complementos_path.exists():
-            self._df_compl = None
-            self._mtime_compl = None
-            return
+    def _load_complementos(self) -> _Catalogo:
+        mtime = _mtime_de(self.complementos_path)
+        if mtime is None:
+            return _Catalogo(None, None, None, {}, None)
 
-        dfc = pd.read_csv(
-            self.complementos_path,
-            quotechar='"',
-            encoding='utf-8',
-            on_bad_lines='skip',
-            dtype=str
-        )
-        dfc.columns = dfc.columns.str.replace('"', '').str.strip()
-        for col in [
+        dfc = pd.concat(_leer_csv(self.complementos_path, [
             'base_nombre','base_codigo',
             'complemento_nombre','complemento_codigo',
             'tipo','razon'
-        ]:
-            if col in dfc.columns:
-                dfc[col] = dfc[col].fillna("").astype(str).str.strip()
+        ], TROZO_FILAS), ignore_index=True)
 
         # índices normalizados para match
         dfc['base_nombre_norm'] = dfc['base_nombre'].map(normalize_text)
@@ -146,15 +664,94 @@ class Inventario:
         dfc['base_codigo_norm'] = dfc['base_codigo'].str.lower().str.strip()
         dfc['complemento_codigo_norm'] = dfc['complemento_codigo'].str.lower().str.strip()
 
-        self._df_compl = dfc
-        self._mtime_compl = self.complementos_path.stat().st_mtime
+        return _Catalogo(
+            dfc,
+            mtime,
+            IndiceTokens(dfc['base_nombre_norm']),
+            dict(dfc.groupby('base_codigo_norm', sort=False).indices),
+            _indice_nombres(dfc, 'base_nombre_norm', 'base_nombre', 'base_codigo'),
+        )
 
-    def _hot_reload_complementos(self):
-        if self._df_compl is None:
+    # -------------------------
+    # Recarga en segundo plano
+    # -------------------------
+    def recargar(self) -> bool:
+        """
+        Si algún CSV cambió, reconstruye solo esa parte fuera del camino de
+        las consultas y publica el snapshot nuevo de una sola vez. Ante un
+        error (p. ej. archivo a medio escribir) se conserva el anterior.
+        Devuelve True si se publicó un snapshot nuevo.
+        """
+        with self._reload_lock:
+            snap = self._snap
+            t0 = time.perf_counter()
+            try:
+                cambio_datos = _mtime_de(self.csv_path) != snap.datos.mtime
+                cambio_cat = _mtime_de(self.complementos_path) != snap.catalogo.mtime
+                if not (cambio_datos or cambio_cat):
+                    return False
+                datos = self._load() if cambio_datos else snap.datos
+                catalogo = self._load_complementos() if cambio_cat else snap.catalogo
+            except Exception as e:
+                self._stats["errores_recarga"] += 1
+                self._stats["ultimo_error"] = f"{type(e).__name__}: {e}"
+                return False
+            self._snap = _Snapshot(datos, catalogo, snap.version + 1, time.time())
+            self._stats["recargas"] += 1
+            self._stats["ultima_recarga_seg"] = time.perf_counter() - t0
+        del snap  # sin referencias al snapshot anterior antes de devolver memoria
+        liberar_memoria()
+        return True
+
+    def iniciar_recarga(self, intervalo_seg: float):
+        if self._hilo is not None and self._hilo.is_alive():
             return
-        m = self.complementos_path.stat().st_mtime
-        if self._mtime_compl != m:
-            self._load_complementos()
+        self._stop.clear()
+        self._hilo = threading.Thread(
+            target=self._bucle_recarga, args=(intervalo_seg,),
+            name="inventario-recarga", daemon=True,
+        )
+        self._hilo.start()
+
+    def detener_recarga(self):
+        self._stop.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def tras_fork(self):
+        """
+        Para llamar en un proceso hijo creado con fork: los hilos no se
+        heredan y el lock pudo quedar tomado, así que se recrean y se
+        vuelve a arrancar la recarga si estaba configurada.
+        """
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._hilo = None
+        if self._recarga_seg > 0:
+            self.iniciar_recarga(self._recarga_seg)
+
+    def _bucle_recarga(self, intervalo_seg: float):
+        while not self._stop.wait(intervalo_seg):
+            self.recargar()
+
+    @property
+    def version(self) -> int:
+        """Versión del snapshot publicado; cambia con cada recarga."""
+        return self._snap.version
+
+    def estado(self) -> Dict[str, Any]:
+        """Métricas de la recarga: duración de la última y edad del snapshot."""
+        snap = self._snap
+        return {
+            "version": snap.version,
+            "snapshot_edad_seg": round(time.time() - snap.creado, 3),
+            "filas": len(snap.datos.df),
+            "filas_catalogo": 0 if snap.catalogo.df is None else len(snap.catalogo.df),
+            "recarga_automatica": self._hilo is not None and self._hilo.is_alive(),
+            "pico_rss_mb": _pico_rss_mb(),
+            **self._stats,
+        }
 
     # -------------------------
     # Utilidades varias
@@ -184,43 +781,44 @@ class Inventario:
         n = normalize_text(s)
         return ALIAS_MAP.get(n, n)
 
-    def _match_complementos(self, producto: str, codigos_disponibles: set[str]) -> List[Dict[str, str]]:
+    def _coincidencia(self, snap: _Snapshot, producto: str) -> Optional[Dict[str, Any]]:
+        hits = self._buscar_productos(snap, producto, limite=1)
+        return hits[0] if hits else None
+
+    def _match_complementos(self, cat: _Catalogo, producto: str, codigos_disponibles: set[str]) -> List[Dict[str, str]]:
         """
         Busca en el catálogo por código (si hay) y por nombre normalizado/tokenizado.
         """
-        if self._df_compl is None or self._df_compl.empty:
+        if cat.df is None or cat.df.empty:
             return []
 
-        dfc = self._df_compl
+        dfc = cat.df
         q_raw = (producto or "").strip()
         q_canon = self._canon_from_alias(q_raw)
-        q_norm = normalize_text(q_canon)
         q_tokens = set(tokenize(q_canon))
 
-        cands = []
+        # posiciones candidatas, en el orden del catálogo: primero por código,
+        # luego por nombre (todos los tokens; si no, cualquiera)
+        cands: List[int] = []
 
         if codigos_disponibles:
-            cand_by_code = dfc[dfc['base_codigo_norm'].isin({c.lower() for c in codigos_disponibles})]
-            if not cand_by_code.empty:
-                cands.append(cand_by_code)
-
-        if q_tokens:
-            mask = dfc['base_nombre_norm'].apply(lambda s: all(t in s for t in q_tokens))
-            cand_by_name = dfc[mask]
-            if cand_by_name.empty:
-                mask_any = dfc['base_nombre_norm'].apply(lambda s: any(t in s for t in q_tokens))
-                cand_by_name = dfc[mask_any]
-            if not cand_by_name.empty:
-                cands.append(cand_by_name)
+            por_codigo = set()
+            for c in {c.lower() for c in codigos_disponibles}:
+                por_codigo.update(cat.codigo_idx.get(c, ()))
+            cands.extend(sorted(por_codigo))
+
+        if q_tokens and cat.idx is not None:
+            por_nombre = cat.idx.todas(q_tokens)
+            if not len(por_nombre):
+                por_nombre = cat.idx.alguna(q_tokens)
+            cands.extend(por_nombre.tolist())
 
         if not cands:
             return []
 
-        mdf = pd.concat(cands, ignore_index=True).drop_duplicates()
-
         out = []
         seen = set()
-        for _, r in mdf.iterrows():
+        for r in dfc.iloc[cands].to_dict(orient='records'):
             key = (r.get("complemento_nombre","").lower(), r.get("complemento_codigo","").lower())
             if key in seen:
                 continue
@@ -231,57 +829,191 @@ class Inventario:
                 "tipo": r.get("tipo",""),
                 "razon": r.get("razon",""),
             })
-        return out[:5]
+            if len(out) == 5:
+                break
+        return out
+
+    # ---------------------------------------
+    # API: búsqueda aproximada de productos
+    # ---------------------------------------
+    def buscar_productos(self, consulta: str, limite: int = 10) -> List[Dict[str, Any]]:
+        """
+        Productos del inventario y del catálogo ordenados por similitud
+        de trigramas con `consulta` (tolera errores de tipeo).
+        """
+        return self._buscar_productos(self._snap, consulta, limite)
+
+    def _buscar_productos(self, snap: _Snapshot, consulta: str, limite: int) -> List[Dict[str, Any]]:
+        q_norm = self._canon_from_alias(consulta)
+        if not q_norm:
+            return []
+
+        hits = []
+        fuentes = (("inventario", snap.datos.trigr_producto), ("catalogo", snap.catalogo.trigr))
+        for fuente, idx in fuentes:
+            if idx is None:
+                continue
+            for pos, score in idx.buscar(q_norm, k=limite):
+                hits.append((score, fuente, idx.textos[pos], idx.items[pos]))
+
+        # un mismo producto puede estar en ambas fuentes: gana el de inventario
+        hits.sort(key=lambda h: (-h[0], h[1] != "inventario"))
+        out = []
+        seen = set()
+        for score, fuente, texto, item in hits:
+            if texto in seen:
+                continue
+            seen.add(texto)
+            out.append({**item, "fuente": fuente, "score": round(score, 3)})
+        return out[:limite]
 
     # ---------------------------------------
     # API: búsqueda de tiendas por 'Zona'
     # ---------------------------------------
     def buscar_tiendas_en_zona(self, zona: str) -> List[Dict[str, Any]]:
-        self._hot_reload()
         z = str(zona).strip()
-        df = self._df.copy()
-        if 'Zona' in df.columns:
-            df['Zona'] = df['Zona'].astype(str).str.extract(r'(\d+)')[0]
-            res = df[df['Zona'] == z]
-        else:
-            res = df.iloc[0:0]
+        return self._registros_zona(self._snap.datos, z)
 
-        cols = [c for c in ['Nombre','Calle','Ciudad','Zona','Producto','Stock','Codigo'] if c in res.columns]
+    @staticmethod
+    def _registros_zona(datos: _Datos, z: str) -> List[Dict[str, Any]]:
+        res = datos.filas_zona(z)
+        cols = [c for c in COLUMNAS_REGISTRO if c in res.columns]
         if not cols:
             return []
-        return res[cols].to_dict(orient='records')
+        return _a_registros(res[cols])
+
+    def buscar_tiendas_en_zonas(self, zonas: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        buscar_tiendas_en_zona para muchas zonas a la vez, con resultado por
+        zona (tal como llegó). Las posiciones de todas salen del índice y se
+        resuelven con un solo iloc y una sola conversión a registros.
+        """
+        datos = self._snap.datos
+        pedidas = {z: z.strip() for z in dict.fromkeys(str(z) for z in zonas)}
+        unicas = [z for z in dict.fromkeys(pedidas.values()) if z in datos.zona_idx]
+        grupos = [datos.zona_idx[z] for z in unicas]
+        por_zona = dict(zip(unicas, _registros_por_grupo(datos.df, grupos, unicas)))
+        return {z: por_zona.get(n, []) for z, n in pedidas.items()}
+
+    def buscar_tiendas_en_zona_json(self, zona: str) -> str:
+        """
+        Igual que buscar_tiendas_en_zona pero ya serializado a JSON; se
+        calcula una vez por zona y snapshot.
+        """
+        z = str(zona).strip()
+        datos = self._snap.datos
+        hit = datos.zona_json.get(z)
+        if hit is None:
+            if z not in datos.zona_idx:
+                return "[]"
+            hit = codec.dumps(self._registros_zona(datos, z))
+            datos.zona_json[z] = hit
+        return hit
+
+    def buscar_tiendas_en_zona_pagina(self, zona: str, limite: int, cursor: Optional[str] = None,
+                                      campos: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Una página de buscar_tiendas_en_zona: {"items", "nextCursor", "total"}.
+        `cursor` es el nextCursor de la página anterior (None = desde el
+        principio) y `campos` limita las columnas de cada registro. Un cursor
+        mal formado o de otros datos (hubo recarga) da ValueError.
+        """
+        if limite <= 0:
+            raise ValueError("limit debe ser mayor que 0")
+        cols = COLUMNAS_REGISTRO
+        if campos:
+            campos = set(campos)
+            desconocidos = sorted(campos - set(COLUMNAS_REGISTRO))
+            if desconocidos:
+                raise ValueError(f"campos desconocidos: {', '.join(desconocidos)}")
+            cols = [c for c in COLUMNAS_REGISTRO if c in campos]
+
+        z = str(zona).strip()
+        datos = self._snap.datos
+        marca = datos.marca()
+        inicio = 0
+        if cursor:
+            off, _, m = str(cursor).partition(":")
+            if not off.isdigit() or not m:
+                raise ValueError("cursor inválido")
+            if m != marca:
+                raise ValueError("cursor vencido: el inventario cambió, hay que empezar de nuevo")
+            inicio = int(off)
+
+        pos = datos.zona_idx.get(z)
+        total = 0 if pos is None else len(pos)
+        fin = min(inicio + limite, total)
+        items = []
+        if inicio < fin:
+            res = datos.filas_zona(z, inicio, fin)
+            cols = [c for c in cols if c in res.columns]
+            if cols:
+                items = _a_registros(res[cols])
+        return {"items": items, "nextCursor": f"{fin}:{marca}" if fin < total else None, "total": total}
 
     # ----------------------------------------------------
     # API: recomendaciones de complementos
     # ----------------------------------------------------
     def recomendar_complementos(self, producto: str, zona: str | None = None) -> Dict[str, Any]:
-        self._hot_reload()
-        self._hot_reload_complementos()
+        return self._recomendar(self._snap, [producto], zona)[0]
+
+    def recomendar_complementos_bulk(self, productos: Iterable[str],
+                                     zona: str | None = None) -> Dict[str, Dict[str, Any]]:
+        """
+        recomendar_complementos para varios productos en la misma zona, con
+        resultado por producto (tal como llegó). La disponibilidad de todos
+        sale de un solo iloc y una sola conversión a registros.
+        """
+        pedidos = list(dict.fromkeys(str(p) for p in productos))
+        return dict(zip(pedidos, self._recomendar(self._snap, pedidos, zona)))
+
+    def _recomendar(self, snap: _Snapshot, productos: List[str], zona: str | None) -> List[Dict[str, Any]]:
+        datos = snap.datos
+        t0 = time.perf_counter()
 
         # ---------- disponibilidad ----------
-        df = self._df.copy()
-        if zona and 'Zona' in df.columns:
-            df['Zona'] = df['Zona'].astype(str).str.extract(r'(\d+)')[0]
-            df = df[df['Zona'] == str(zona)]
-
-        has_producto = 'Producto' in df.columns
-
-        if has_producto:
-            q_norm = normalize_text(producto)
-            base = df[df['Producto_norm'].str.contains(q_norm, na=False)]
-            cols = [c for c in ['Nombre','Calle','Ciudad','Zona','Producto','Stock','Codigo'] if c in base.columns]
-            disponibilidad = base[cols].to_dict(orient='records') if cols else base.to_dict(orient='records')
+        df = datos.df
+        coincidencias: List[Optional[Dict[str, Any]]] = [None] * len(productos)
+        if 'Producto' in df.columns:
+            con_zona = bool(zona) and 'Zona' in df.columns
+            zpos = datos.zona_idx.get(str(zona), np.empty(0, dtype=np.intp)) if con_zona else None
+            grupos = []
+            for i, producto in enumerate(productos):
+                pos = datos.filas_producto(normalize_text(producto))
+                if pos is not None and not len(pos):
+                    # sin coincidencia literal: se corrige con la búsqueda aproximada
+                    coincidencias[i] = self._coincidencia(snap, producto)
+                    if coincidencias[i]:
+                        pos = datos.filas_producto(normalize_text(coincidencias[i]["nombre"]))
+                if zpos is not None:
+                    pos = zpos if pos is None else np.intersect1d(pos, zpos, assume_unique=True)
+                grupos.append(np.arange(len(df)) if pos is None else pos)
+            disponibilidades = _registros_por_grupo(df, grupos, str(zona) if con_zona else None)
         else:
-            disponibilidad = []
-
-        codigos = {str(r.get("Codigo","")).strip().lower() for r in disponibilidad if r.get("Codigo")}
-        codigos = {c for c in codigos if c}
+            disponibilidades = [[] for _ in productos]
+        t1 = time.perf_counter()
+        _ETAPAS.observe(t1 - t0, etapa="disponibilidad")
 
         # ---------- complementos del catálogo ----------
-        sugeridos = self._match_complementos(producto, codigos)
+        sugeridos_por = []
+        for i, (producto, disponibilidad) in enumerate(zip(productos, disponibilidades)):
+            codigos = {str(r.get("Codigo","")).strip().lower() for r in disponibilidad if r.get("Codigo")}
+            codigos = {c for c in codigos if c}
+            sugeridos = self._match_complementos(snap.catalogo, producto, codigos)
+            if not sugeridos:
+                coincidencias[i] = coincidencias[i] or self._coincidencia(snap, producto)
+                if coincidencias[i]:
+                    sugeridos = self._match_complementos(snap.catalogo, coincidencias[i]["nombre"], set())
+            sugeridos_por.append(sugeridos)
+        t2 = time.perf_counter()
+        _ETAPAS.observe(t2 - t1, etapa="complementos")
 
         # ---------- fallback si no hubo match ----------
-        if not sugeridos:
+        usados = False
+        for producto, sugeridos in zip(productos, sugeridos_por):
+            if sugeridos:
+                continue
+            usados = True
             for s in self._suggest_by_rules(producto):
                 sugeridos.append({
                     "complemento_nombre": s,
@@ -289,5 +1021,13 @@ class Inventario:
                     "tipo": "cross-sell",
                     "razon": "Sugerencia por tipo de producto"
                 })
+        if usados:
+            _ETAPAS.observe(time.perf_counter() - t2, etapa="fallback")
 
-        return {"disponibilidad": disponibilidad, "sugeridos": sugeridos}
+        salida = []
+        for disponibilidad, sugeridos, coincidencia in zip(disponibilidades, sugeridos_por, coincidencias):
+            out = {"disponibilidad": disponibilidad, "sugeridos": sugeridos}
+            if coincidencia:
+                out["coincidencia"] = coincidencia
+            salida.append(out)
+        return salida
@@ -1,29 +1,148 @@
 # Servidor MCP vía WebSocket
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import PlainTextResponse
-from typing import List, Dict, Any
-import json, os, re
+from fastapi.responses import PlainTextResponse, JSONResponse, Response
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TYPE_CHECKING
+import asyncio, multiprocessing, os, re, threading, time
 
-from inventario import Inventario
+import codec
+import metricas
+from cache import LRUCache
+from codec import RawJSON
+
+if TYPE_CHECKING:
+    from inventario import Inventario
 
 CSV_PATH = os.getenv("INVENTARIO_CSV", "prueba.csv")
-inv = Inventario(CSV_PATH)
+
+# Carga del inventario (pandas + CSV) fuera del import del módulo.
+#   MCP_CARGA: startup = en segundo plano al arrancar FastAPI (por defecto;
+#              /healthz responde de inmediato y /readyz cuando termina)
+#              lazy    = en el primer uso
+#              import  = al importar el módulo, como antes
+CARGA = os.getenv("MCP_CARGA", "startup")
+_inv: "Optional[Inventario]" = None
+_inv_lock = threading.Lock()
+
+def get_inv() -> "Inventario":
+    """El inventario, cargándolo (una sola vez) si aún no está."""
+    global _inv
+    if _inv is None:
+        with _inv_lock:
+            if _inv is None:
+                from inventario import Inventario  # importa pandas/numpy
+                _inv = Inventario(CSV_PATH)
+    return _inv
+
+def listo() -> bool:
+    return _inv is not None
+
+def data_version() -> int:
+    # sin forzar la carga: 0 mientras el inventario no esté listo
+    return _inv.version if _inv is not None else 0
+
+if CARGA == "import":
+    get_inv()
+
+# Ejecución de herramientas fuera del event loop.
+#   MCP_EXECUTOR: thread | process | inline (inline = en el loop, como antes)
+#   MCP_WORKERS: hilos/procesos del pool
+#   MCP_QUEUE_MAX: llamadas que pueden esperar turno además de las que corren
+#   MCP_TOOL_TIMEOUT: segundos máximos por llamada
+EXECUTOR_KIND = os.getenv("MCP_EXECUTOR", "thread")
+WORKERS = int(os.getenv("MCP_WORKERS", str(min(8, os.cpu_count() or 1))))
+QUEUE_MAX = int(os.getenv("MCP_QUEUE_MAX", "64"))
+TOOL_TIMEOUT = float(os.getenv("MCP_TOOL_TIMEOUT", "10"))
+# Cache de resultados de tools/call (0 = desactivada). Se invalida sola: la
+# clave incluye la versión del snapshot del inventario.
+CACHE_SIZE = int(os.getenv("MCP_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.getenv("MCP_CACHE_TTL", "300"))
+# Requests en vuelo por conexión WebSocket
+MAX_INFLIGHT = int(os.getenv("MCP_MAX_INFLIGHT", "16"))
+# Páginas de find_stores_by_zone: tope de "limit" y tamaño por defecto de
+# cada mensaje parcial en modo stream
+PAGE_MAX = int(os.getenv("MCP_PAGE_MAX", "1000"))
+STREAM_PAGE = int(os.getenv("MCP_STREAM_PAGE", "200"))
+# Entradas máximas por llamada de las herramientas bulk
+BULK_MAX = int(os.getenv("MCP_BULK_MAX", "1000"))
+# Tope de "limit" en search_products
+SEARCH_MAX = int(os.getenv("MCP_SEARCH_MAX", "50"))
 
 app = FastAPI(title="MCP Inventario (WS)")
 
+# ---------- Métricas (GET /metrics) ----------
+RPC_SECONDS = metricas.histograma("mcp_rpc_seconds", "Duracion de cada request JSON-RPC.", ["method"])
+TOOL_SECONDS = metricas.histograma("mcp_tool_seconds", "Ejecucion de herramientas (sin aciertos de cache).", ["tool"])
+TOOL_ERRORS = metricas.contador("mcp_tool_errors_total", "Errores de tools/call por codigo JSON-RPC.", ["tool", "code"])
+CACHE_TOTAL = metricas.contador("mcp_tool_cache_total", "Resultado de la cache de tools/call.", ["result"])
+ENCODE_SECONDS = metricas.histograma("mcp_encode_seconds", "Serializacion JSON de cada respuesta.")
+WS_ACTIVE = metricas.medidor("mcp_ws_active", "Conexiones WebSocket abiertas.")
+INFLIGHT = metricas.medidor("mcp_requests_inflight", "Requests JSON-RPC en curso.")
+metricas.medidor("mcp_tool_pending", "Herramientas en el pool (corriendo o en cola).", fn=lambda: _pendientes)
+
+def _stat_inventario(clave: str):
+    return lambda: _inv._stats.get(clave) if _inv is not None else None
+
+metricas.contador("inventario_recargas_total", "Snapshots publicados por recarga.", fn=_stat_inventario("recargas"))
+metricas.contador("inventario_errores_recarga_total", "Recargas fallidas.", fn=_stat_inventario("errores_recarga"))
+metricas.medidor("inventario_ultima_recarga_seconds", "Duracion de la ultima carga.", fn=_stat_inventario("ultima_recarga_seg"))
+metricas.medidor("inventario_version", "Version del snapshot publicado (0 = sin cargar).", fn=lambda: data_version())
+
 # HTTP GET /
 @app.get("/", response_class=PlainTextResponse)
 def root():
     return "MCP WS server. Connect via WebSocket at /mcp (subprotocol: jsonrpc)."
 
+@app.on_event("startup")
+async def _cargar_en_segundo_plano():
+    if CARGA == "startup" and not listo():
+        # no se espera: el servidor acepta conexiones mientras carga
+        app.state.carga = asyncio.get_running_loop().run_in_executor(None, get_inv)
+
+# Liveness: el proceso responde (no depende de los datos)
+@app.get("/healthz")
+def healthz():
+    return {"ok": True}
+
+# Readiness: el inventario está cargado y se pueden atender herramientas
+@app.get("/readyz")
+def readyz():
+    if not listo():
+        return JSONResponse({"ready": False}, status_code=503)
+    return {"ready": True, "version": data_version()}
+
+@app.get("/metrics")
+def metrics():
+    return Response(metricas.exponer(), media_type=metricas.CONTENT_TYPE)
+
+# HTTP GET /status: estado del snapshot de inventario (versión, edad, recargas)
+@app.get("/status")
+def status():
+    if not listo():
+        return JSONResponse({"ready": False}, status_code=503)
+    return JSONResponse({**_inv.estado(), "cache": {**tool_cache.stats(), "coalesced": _coalescidas}})
+
 # Definición de herramientas MCP
 TOOLS = [
     {
         "name": "find_stores_by_zone",
-        "description": "Devuelve tiendas/stock por zona.",
+        "description": (
+            "Devuelve tiendas/stock por zona. Sin limit/cursor/fields responde la lista "
+            "completa; con ellos, una página {items, nextCursor, total}. Con stream=true "
+            "las páginas llegan como notifications/progress y el resultado final trae el total."
+        ),
         "input_schema": {
             "type": "object",
-            "properties": {"zone": {"type": "string"}},
+            "properties": {
+                "zone": {"type": "string"},
+                "limit": {"type": "integer", "minimum": 1},
+                "cursor": {"type": "string"},
+                "fields": {
+                    "type": "array",
+                    "items": {"enum": ["Nombre", "Calle", "Ciudad", "Zona", "Producto", "Stock", "Codigo"]},
+                },
+                "stream": {"type": "boolean"},
+            },
             "required": ["zone"],
         },
     },
@@ -39,11 +158,277 @@ TOOLS = [
             "required": ["product_name"],
         },
     },
+    {
+        "name": "find_stores_by_zones",
+        "description": "Tiendas/stock de varias zonas en una sola llamada, como {zona: [tiendas]}.",
+        "input_schema": {
+            "type": "object",
+            "properties": {"zones": {"type": "array", "items": {"type": "string"}}},
+            "required": ["zones"],
+        },
+    },
+    {
+        "name": "recommend_complements_bulk",
+        "description": "recommend_complements para varios productos en la misma zona, como {producto: resultado}.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "product_names": {"type": "array", "items": {"type": "string"}},
+                "zone": {"type": "string"},
+            },
+            "required": ["product_names"],
+        },
+    },
+    {
+        "name": "search_products",
+        "description": "Búsqueda aproximada de productos (tolera errores de tipeo), ordenada por score.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string"},
+                "limit": {"type": "integer", "minimum": 1},
+            },
+            "required": ["query"],
+        },
+    },
 ]
 
 PROTOCOL = "MCP/2025-06-18"
+TOOL_NAMES = {t["name"] for t in TOOLS}
+
+# Errores propios (rango reservado a implementaciones de JSON-RPC)
+ERR_BUSY = -32001
+ERR_TIMEOUT = -32002
+ERR_INVALID_PARAMS = -32602
 
-async def handle_rpc(req: dict) -> dict:
+class InvalidParams(Exception):
+    pass
+
+def _limit_arg(args: dict, defecto: int, tope: int) -> int:
+    """"limit" validado: entero positivo, recortado a `tope`."""
+    try:
+        limit = defecto if args.get("limit") is None else int(args["limit"])
+    except (TypeError, ValueError):
+        raise InvalidParams("limit debe ser un entero")
+    if limit <= 0:
+        raise InvalidParams("limit debe ser mayor que 0")
+    return min(limit, tope)
+
+def _pagina_args(args: dict) -> tuple:
+    """(limit, cursor, fields) validados de find_stores_by_zone."""
+    limit = _limit_arg(args, PAGE_MAX, PAGE_MAX)
+    fields = args.get("fields")
+    if fields is not None and not (isinstance(fields, list) and all(isinstance(f, str) for f in fields)):
+        raise InvalidParams("fields debe ser una lista de nombres de columna")
+    cursor = args.get("cursor")
+    return limit, None if cursor is None else str(cursor), fields
+
+def _lista_args(args: dict, clave: str) -> List[str]:
+    """Lista de entradas de una herramienta bulk, validada."""
+    valores = args.get(clave)
+    if not isinstance(valores, list) or not all(isinstance(v, (str, int)) for v in valores):
+        raise InvalidParams(f"{clave} debe ser una lista de textos")
+    if len(valores) > BULK_MAX:
+        raise InvalidParams(f"{clave} admite hasta {BULK_MAX} elementos")
+    return [str(v) for v in valores]
+
+def run_tool(name: str, args: dict) -> Any:
+    """
+    Ejecuta una herramienta de forma síncrona (corre dentro del pool).
+    find_stores_by_zone devuelve RawJSON, que solo ws_mcp sabe serializar.
+    """
+    inv = get_inv()
+    if name == "find_stores_by_zone":
+        zone = str(args.get("zone", "")).strip()
+        if any(k in args for k in ("limit", "cursor", "fields")):
+            limit, cursor, fields = _pagina_args(args)
+            try:
+                return inv.buscar_tiendas_en_zona_pagina(zone, limit, cursor, fields)
+            except ValueError as e:
+                raise InvalidParams(str(e))
+        # ya serializado y cacheado por snapshot: solo se arma el sobre
+        return RawJSON(inv.buscar_tiendas_en_zona_json(zone))
+
+    if name == "recommend_complements":
+        product_name = str(args.get("product_name", "")).strip()
+        zone = args.get("zone")
+        if zone is not None:
+            zone = str(zone).strip()
+        return inv.recomendar_complementos(product_name, zone)
+
+    if name == "find_stores_by_zones":
+        return inv.buscar_tiendas_en_zonas(_lista_args(args, "zones"))
+
+    if name == "recommend_complements_bulk":
+        productos = _lista_args(args, "product_names")
+        zone = args.get("zone")
+        if zone is not None:
+            zone = str(zone).strip()
+        return inv.recomendar_complementos_bulk(productos, zone)
+
+    if name == "search_products":
+        query = str(args.get("query", "")).strip()
+        return inv.buscar_productos(query, _limit_arg(args, 10, SEARCH_MAX))
+
+    raise KeyError(name)
+
+def _init_worker():
+    # proceso hijo (del pool o worker de gunicorn): candado nuevo por si el fork
+    # ocurrió con la carga en curso en otro hilo, y reactivar la recarga del
+    # inventario heredado (si aún no se había cargado, lo carga en su primer uso)
+    global _inv_lock
+    _inv_lock = threading.Lock()
+    if _inv is not None:
+        _inv.tras_fork()
+
+def _make_executor() -> Optional[Executor]:
+    if EXECUTOR_KIND == "inline":
+        return None
+    if EXECUTOR_KIND == "process":
+        # spawn: el hilo de carga de arranque puede tener tomado _inv_lock y
+        # un fork lo heredaría cerrado para siempre; cada hijo carga su copia
+        # (rápido con el snapshot)
+        return ProcessPoolExecutor(max_workers=WORKERS, initializer=_init_worker,
+                                   mp_context=multiprocessing.get_context("spawn"))
+    return ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="mcp-tool")
+
+executor = _make_executor()
+_pendientes = 0
+
+class ToolBusy(Exception):
+    pass
+
+tool_cache = LRUCache(CACHE_SIZE, CACHE_TTL)
+# llamadas idénticas en curso: la segunda espera a la primera en vez de recalcular
+_en_curso: Dict[str, asyncio.Task] = {}
+_coalescidas = 0
+
+def _cache_key(name: str, args: dict) -> str:
+    # mayúsculas y espacios no cambian el resultado de ninguna herramienta
+    norm = {
+        k: " ".join(v.lower().split()) if isinstance(v, str) else v
+        for k, v in args.items()
+    }
+    return codec.dumps([name, data_version(), sorted(norm.items())])
+
+async def call_tool_cached(name: str, args: dict) -> Any:
+    if CACHE_SIZE <= 0:
+        return await call_tool(name, args)
+    key = _cache_key(name, args)
+    hit = tool_cache.get(key)
+    if hit is not None:
+        CACHE_TOTAL.inc(result="hit")
+        return hit
+    pendiente = _en_curso.get(key)
+    if pendiente is not None:
+        global _coalescidas
+        _coalescidas += 1
+        CACHE_TOTAL.inc(result="coalesced")
+        return await asyncio.shield(pendiente)
+    CACHE_TOTAL.inc(result="miss")
+
+    # el cálculo es una tarea propia y todos (también quien la lanzó) la
+    # esperan con shield: si ese cliente se desconecta y su tarea se cancela,
+    # los demás siguen esperando el resultado y no reciben su CancelledError
+    tarea = asyncio.create_task(_calcular(key, name, args))
+    tarea.add_done_callback(lambda t: t.cancelled() or t.exception())  # sin aviso si nadie la espera
+    _en_curso[key] = tarea
+    return await asyncio.shield(tarea)
+
+async def _calcular(key: str, name: str, args: dict) -> Any:
+    try:
+        result = await call_tool(name, args)
+        tool_cache.put(key, result)
+        return result
+    finally:
+        _en_curso.pop(key, None)
+
+async def call_tool(name: str, args: dict) -> Any:
+    """
+    Despacha la herramienta al pool. Si ya hay WORKERS + QUEUE_MAX llamadas
+    en curso se rechaza (ToolBusy) en vez de encolar sin límite; una llamada
+    que supera TOOL_TIMEOUT sigue ocupando su worker hasta terminar, así que
+    cuenta para el límite mientras tanto.
+    """
+    global _pendientes
+    if executor is None:
+        with TOOL_SECONDS.medir(tool=name):
+            return run_tool(name, args)
+    if _pendientes >= WORKERS + QUEUE_MAX:
+        raise ToolBusy()
+
+    loop = asyncio.get_running_loop()
+
+    def _liberar(_):
+        global _pendientes
+        _pendientes -= 1
+
+    _pendientes += 1
+    t0 = time.perf_counter()
+    fut = executor.submit(run_tool, name, args)
+    fut.add_done_callback(lambda f: loop.call_soon_threadsafe(_liberar, f))
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(fut), TOOL_TIMEOUT)
+    finally:
+        # incluye la espera en la cola del pool: es lo que ve el cliente
+        TOOL_SECONDS.observe(time.perf_counter() - t0, tool=name)
+
+Notificar = Callable[[dict], Awaitable[None]]
+
+async def transmitir_zona(args: dict, token: Any, notificar: Notificar) -> dict:
+    """
+    Modo stream de find_stores_by_zone: cada página sale como
+    notifications/progress (con sus items) apenas está lista, y el resultado
+    final solo trae el total. En memoria hay una página a la vez.
+    """
+    pagina = {k: v for k, v in args.items() if k != "stream"}
+    pagina["limit"] = pagina.get("limit") or STREAM_PAGE
+    enviados = partes = 0
+    while True:
+        res = await call_tool("find_stores_by_zone", pagina)
+        enviados += len(res["items"])
+        partes += 1
+        await notificar({
+            "jsonrpc": "2.0", "method": "notifications/progress",
+            "params": {"progressToken": token, "progress": enviados,
+                       "total": res["total"], "items": res["items"]},
+        })
+        if res["nextCursor"] is None:
+            return {"total": res["total"], "parts": partes}
+        pagina["cursor"] = res["nextCursor"]
+
+async def handle_rpc(req: dict | list, notificar: Optional[Notificar] = None) -> dict | list | None:
+    """
+    Maneja un request JSON-RPC o un batch (lista). Los elementos de un batch
+    se ejecutan concurrentemente y se responde con una sola lista; las
+    notificaciones (sin "id") no generan respuesta, así que puede devolver
+    None si no hay nada que enviar. `notificar` envía mensajes parciales
+    antes de la respuesta (modo stream); sin él, stream se ignora.
+    """
+    if isinstance(req, list):
+        if not req:
+            return _invalid_request()
+        resps = await asyncio.gather(*(_handle_one(r, notificar) for r in req))
+        resps = [r for r in resps if r is not None]
+        return resps or None
+    return await _handle_one(req, notificar)
+
+def _invalid_request() -> dict:
+    return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}}
+
+async def _handle_one(req: Any, notificar: Optional[Notificar] = None) -> dict | None:
+    if not isinstance(req, dict):
+        return _invalid_request()
+    method = req.get("method")
+    t0 = time.perf_counter()
+    resp = await _dispatch(req, notificar)
+    RPC_SECONDS.observe(time.perf_counter() - t0,
+                        method=method if method in ("initialize", "tools/list", "tools/call") else "other")
+    if "id" not in req:
+        return None
+    return resp
+
+async def _dispatch(req: dict, notificar: Optional[Notificar] = None) -> dict:
     """Maneja métodos JSON-RPC propios del MCP."""
     j = {"jsonrpc": "2.0", "id": req.get("id")}
     method = req.get("method")
@@ -55,33 +440,39 @@ async def handle_rpc(req: dict) -> dict:
                 "protocol": PROTOCOL,
                 "capabilities": {"tools": True},
                 "tools": TOOLS,
+                # los clientes lo usan para invalidar lo que derivaron de los datos
+                "dataVersion": data_version(),
             }
             return j
 
         if method == "tools/list":
-            j["result"] = {"tools": TOOLS}
+            j["result"] = {"tools": TOOLS, "dataVersion": data_version()}
             return j
 
         if method == "tools/call":
             name = params.get("name")
             args = params.get("arguments") or {}
-            if name == "find_stores_by_zone":
-                zone = str(args.get("zone", "")).strip()
-                result = inv.buscar_tiendas_en_zona(zone)
-                j["result"] = result
-                return j
-
-            if name == "recommend_complements":
-                product_name = str(args.get("product_name", "")).strip()
-                zone = args.get("zone")
-                if zone is not None:
-                    zone = str(zone).strip()
-                result = inv.recomendar_complementos(product_name, zone)
-                j["result"] = result
+            if name not in TOOL_NAMES:
+                # método no encontrado
+                j["error"] = {"code": -32601, "message": "Method not found"}
                 return j
-
-            # método no encontrado
-            j["error"] = {"code": -32601, "message": "Method not found"}
+            try:
+                if name == "find_stores_by_zone" and args.get("stream") and notificar is not None:
+                    token = (params.get("_meta") or {}).get("progressToken", req.get("id"))
+                    j["result"] = await transmitir_zona(args, token, notificar)
+                else:
+                    j["result"] = await call_tool_cached(name, args)
+            except InvalidParams as e:
+                j["error"] = {"code": ERR_INVALID_PARAMS, "message": f"Invalid params: {e}"}
+            except ToolBusy:
+                j["error"] = {"code": ERR_BUSY, "message": "Server busy: tool queue is full"}
+            except asyncio.TimeoutError:
+                j["error"] = {"code": ERR_TIMEOUT, "message": f"Tool timeout after {TOOL_TIMEOUT:g}s"}
+            except Exception:
+                TOOL_ERRORS.inc(tool=name, code=-32603)
+                raise
+            if "error" in j:
+                TOOL_ERRORS.inc(tool=name, code=j["error"]["code"])
             return j
 
         # método desconocido
@@ -100,19 +491,56 @@ async def ws_mcp(websocket: WebSocket):
     else:
         await websocket.accept()
 
+    # Cada request corre en su propia tarea y responde en cuanto termina
+    # (el cliente empareja por "id"). Con MAX_INFLIGHT en vuelo se deja de
+    # leer del socket hasta que alguna termine: backpressure hacia el cliente.
+    inflight = asyncio.Semaphore(MAX_INFLIGHT)
+    send_lock = asyncio.Lock()
+    tareas = set()
+
+    async def enviar(payload: dict | list):
+        t0 = time.perf_counter()
+        texto = codec.encode_response(payload)
+        ENCODE_SECONDS.observe(time.perf_counter() - t0)
+        async with send_lock:
+            await websocket.send_text(texto)
+
+    async def atender(req):
+        INFLIGHT.inc()
+        try:
+            resp = await handle_rpc(req, enviar)
+            if resp is not None:
+                await enviar(resp)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            INFLIGHT.dec()
+            inflight.release()
+
+    WS_ACTIVE.inc()
+
     try:
         while True:
             raw = await websocket.receive_text()
             try:
-                req = json.loads(raw)
-            except json.JSONDecodeError:
-                await websocket.send_text(
-                    json.dumps({"jsonrpc": "2.0", "error": {"code": -32700, "message": "Parse error"}})
-                )
+                req = codec.loads(raw)
+            except ValueError:
+                await enviar({"jsonrpc": "2.0", "error": {"code": -32700, "message": "Parse error"}})
                 continue
 
-            resp = await handle_rpc(req)
-            await websocket.send_text(json.dumps(resp))
+            await inflight.acquire()
+            t = asyncio.create_task(atender(req))
+            tareas.add(t)
+            t.add_done_callback(tareas.discard)
 
     except WebSocketDisconnect:
+        for t in tareas:
+            t.cancel()
         return
+    finally:
+        WS_ACTIVE.dec()
+
+if __name__ == "__main__":
+    # un solo proceso; para varios workers: gunicorn -c gunicorn.conf.py mcp_server:app
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
@@ -0,0 +1,155 @@
+# metricas.py
+# Métricas estilo Prometheus sin dependencias: contadores, medidores e
+# histogramas con etiquetas, y su exposición en formato de texto 0.0.4 para
+# GET /metrics. Observar cuesta un lock y un bisect, así que se puede dejar
+# activado en producción. Thread-safe (las herramientas corren en un pool);
+# con MCP_EXECUTOR=process lo medido dentro de los hijos no llega al padre.
+# Lo usan el servidor MCP y el cliente web (Cliente/web_client_server.py).
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escapar(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _etiquetas(nombres: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (),
+                 fn: Optional[Callable[[], float]] = None):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.fn = fn  # valor calculado al exponer (sin etiquetas)
+        self._lock = threading.Lock()
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def _clave(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.etiquetas)
+
+    def _muestras(self) -> List[str]:
+        if self.fn is not None:
+            v = self.fn()
+            return [] if v is None else [f"{self.nombre} {_num(v)}"]
+        with self._lock:
+            items = list(self._valores.items())
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, k)} {_num(v)}" for k, v in items]
+
+    def exponer(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}", *self._muestras()]
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, n: float = 1, **labels):
+        k = self._clave(labels)
+        with self._lock:
+            self._valores[k] = self._valores.get(k, 0) + n
+
+class Medidor(_Metrica):
+    tipo = "gauge"
+
+    def set(self, v: float, **labels):
+        with self._lock:
+            self._valores[self._clave(labels)] = v
+
+    def inc(self, n: float = 1, **labels):
+        k = self._clave(labels)
+        with self._lock:
+            self._valores[k] = self._valores.get(k, 0) + n
+
+    def dec(self, n: float = 1, **labels):
+        self.inc(-n, **labels)
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (),
+                 buckets: Iterable[float] = BUCKETS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # por etiquetas: [conteos por bucket (+Inf al final), suma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, v: float, **labels):
+        k = self._clave(labels)
+        i = bisect_left(self.buckets, v)
+        with self._lock:
+            s = self._series.get(k)
+            if s is None:
+                s = self._series[k] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += v
+            s[2] += 1
+
+    @contextmanager
+    def medir(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            series = [(k, list(s[0]), s[1], s[2]) for k, s in self._series.items()]
+        out = []
+        for k, conteos, suma, total in series:
+            acum = 0
+            for b, c in zip(self.buckets + (float("inf"),), conteos):
+                acum += c
+                le = 'le="%s"' % _num(b)
+                out.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, k, le)} {acum}")
+            out.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, k)} {_num(suma)}")
+            out.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, k)} {total}")
+        return out
+
+class Registro:
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, m: _Metrica) -> _Metrica:
+        with self._lock:
+            # idempotente: reimportar un módulo no duplica la métrica
+            return self._metricas.setdefault(m.nombre, m)
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (), fn=None) -> Contador:
+        return self._registrar(Contador(nombre, ayuda, etiquetas, fn))
+
+    def medidor(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (), fn=None) -> Medidor:
+        return self._registrar(Medidor(nombre, ayuda, etiquetas, fn))
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (),
+                   buckets: Iterable[float] = BUCKETS) -> Histograma:
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def exponer(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for m in metricas:
+            lineas.extend(m.exponer())
+        return "\n".join(lineas) + "\n"
+
+REGISTRO = Registro()
+contador = REGISTRO.contador
+medidor = REGISTRO.medidor
+histograma = REGISTRO.histograma
+exponer = REGISTRO.exponer
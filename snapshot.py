@@ -0,0 +1,112 @@
+# snapshot.py
+# Snapshot binario de objetos ya parseados (DataFrame + índices) junto al CSV.
+# Formato: cabecera JSON (clave de validez + tabla de buffers), el pickle
+# (protocolo 5) y los buffers de numpy fuera de banda, alineados a 64 bytes.
+# Al cargar, los arreglos numpy apuntan directo al archivo mapeado con mmap:
+# no se copian y varios procesos worker comparten las mismas páginas.
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+MAGIA = b"INVSNAP\x01"
+ALINEACION = 64
+
+def sha256_archivo(path: Path, bloque: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for trozo in iter(lambda: f.read(bloque), b""):
+            h.update(trozo)
+    return h.hexdigest()
+
+def _relleno(n: int) -> int:
+    return -n % ALINEACION
+
+@contextlib.contextmanager
+def bloqueo(path: Path) -> Iterator[bool]:
+    """
+    Lock exclusivo entre procesos sobre `<path>.lock` (flock). Con varios
+    workers, solo uno reconstruye el snapshot y los demás esperan y cargan
+    el que dejó. Entrega False si el archivo del lock no se puede crear
+    (p. ej. directorio de solo lectura): ahí tampoco se podrá guardar.
+    """
+    if fcntl is None:
+        yield True
+        return
+    try:
+        f = open(f"{path}.lock", "a")
+    except OSError:
+        yield False
+        return
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def guardar(path: Path, obj: Any, clave: Dict[str, Any]):
+    """Escribe el snapshot de forma atómica (archivo temporal + rename)."""
+    buffers = []
+    datos = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    vistas = [b.raw() for b in buffers]
+
+    tabla = []
+    off = 0
+    for v in vistas:
+        tabla.append([off, v.nbytes])
+        off += v.nbytes + _relleno(v.nbytes)
+    cabecera = json.dumps({"clave": clave, "pickle": len(datos), "buffers": tabla}).encode("utf-8")
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIA + struct.pack("<Q", len(cabecera)) + cabecera + datos)
+            f.write(b"\0" * _relleno(f.tell()))
+            for v in vistas:
+                f.write(v)
+                f.write(b"\0" * _relleno(v.nbytes))
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+def cargar(path: Path, valida: Callable[[Dict[str, Any]], bool]) -> Optional[Any]:
+    """
+    Objeto del snapshot, o None si no existe, está dañado o `valida(clave)`
+    lo rechaza. Los buffers quedan respaldados por el mmap (solo lectura).
+    """
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        cab = None
+        if mm[:len(MAGIA)] == MAGIA:
+            p = len(MAGIA)
+            (n,) = struct.unpack_from("<Q", mm, p)
+            p += 8
+            cab = json.loads(bytes(mm[p:p + n]))
+            p += n
+        if cab is None or not valida(cab["clave"]):
+            mm.close()
+            return None
+        datos = memoryview(mm)[p:p + cab["pickle"]]
+        p += cab["pickle"]
+        p += _relleno(p)
+        vista = memoryview(mm)
+        buffers = [vista[p + off:p + off + size] for off, size in cab["buffers"]]
+        return pickle.loads(datos, buffers=buffers)
+    except Exception:
+        return None